@@ -1,13 +1,45 @@
+from datetime import datetime, timezone
+
 TAG_NAME_MAX_LENGTH = 50
 TAG_COLOR_MAX_LENGTH = 7
 
 INGREDIENT_NAME_MAX_LENGTH = 100
 INGREDIENT_MEASUREMENT_UNIT_MAX_LENGTH = 10
+INGREDIENT_SEARCH_LIMIT = 50
 
 RECIPE_NAME_MAX_LENGTH = 200
 RECIPE_IMAGE_UPLOAD_TO = 'recipe_images/'
+RECIPE_IMAGE_RENDITIONS_UPLOAD_TO = 'recipe_images/renditions/'
+RECIPE_IMAGE_RENDITIONS = {
+    'thumbnail': (360, 360),
+    'medium': (960, 960),
+}
+RECIPE_IMAGE_RENDITION_FORMATS = {
+    'webp': ('WEBP', 80),
+    'jpeg': ('JPEG', 85),
+}
+RECIPE_SEARCH_CONFIG = 'russian'
 
 RECIPE_INGREDIENT_AMOUNT_MIN = 1
 RECIPE_INGREDIENT_AMOUNT_MAX = 10000
 
 COOKING_TIME_MIN = 1
+
+BULK_RECIPE_IDS_MAX = 100
+
+SHOPPING_CART_EXPORT_CACHE_TIMEOUT = 60 * 60
+SHOPPING_CART_EXPORT_CHUNK_SIZE = 8192
+
+TAGS_CHANGE_STAMP = 'tags'
+INGREDIENTS_CHANGE_STAMP = 'ingredients'
+RECIPES_CHANGE_STAMP = 'recipes'
+POPULARITY_CHANGE_STAMP = 'popularity'
+# Per-user stamp of favorites, cart and subscriptions: 'viewer:<user id>'.
+VIEWER_CHANGE_STAMP = 'viewer'
+
+PAGINATION_COUNT_CACHE_TIMEOUT = 60
+PAGINATION_COUNT_ESTIMATE_THRESHOLD = 10000
+
+RECIPE_POPULARITY_EPOCH = datetime(2024, 1, 1, tzinfo=timezone.utc)
+POPULAR_RECIPES_LIMIT = 10
+POPULAR_RECIPES_LIMIT_MAX = 100
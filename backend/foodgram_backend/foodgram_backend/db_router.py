@@ -0,0 +1,199 @@
+import hashlib
+import logging
+import random
+import threading
+import time
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.exceptions import ImproperlyConfigured
+from django.db import DEFAULT_DB_ALIAS, DatabaseError, connections
+
+logger = logging.getLogger(__name__)
+
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+# Replica chosen for the current request; None routes reads to the primary.
+current_replica = ContextVar('current_replica', default=None)
+
+
+class ReplicaHealth:
+    """Per-process record of which replicas answered their last probe.
+
+    A replica is probed at most once per check interval. It is unhealthy
+    when the connection fails or, on PostgreSQL, when it lags the primary
+    by more than the configured number of seconds.
+    """
+
+    def __init__(self):
+        self._checked = {}
+        self._lock = threading.Lock()
+
+    @property
+    def config(self):
+        return settings.READ_REPLICAS
+
+    def is_healthy(self, alias):
+        now = time.monotonic()
+        with self._lock:
+            checked_at, healthy = self._checked.get(alias, (None, False))
+            if (
+                checked_at is not None
+                and now - checked_at < self.config['HEALTH_CHECK_INTERVAL']
+            ):
+                return healthy
+            self._checked[alias] = (now, healthy)
+        healthy = self._probe(alias)
+        with self._lock:
+            self._checked[alias] = (now, healthy)
+        return healthy
+
+    def _probe(self, alias):
+        connection = connections[alias]
+        try:
+            connection.ensure_connection()
+            if connection.vendor == 'postgresql':
+                with connection.cursor() as cursor:
+                    cursor.execute(
+                        'SELECT CASE WHEN pg_last_wal_receive_lsn() = '
+                        'pg_last_wal_replay_lsn() THEN 0 ELSE EXTRACT('
+                        'EPOCH FROM now() - pg_last_xact_replay_timestamp()'
+                        ') END'
+                    )
+                    lag = cursor.fetchone()[0]
+                if lag is not None and lag > self.config['MAX_LAG']:
+                    logger.warning(
+                        'Replica %s lags by %.1fs; reading from primary',
+                        alias, lag
+                    )
+                    return False
+        except DatabaseError as error:
+            logger.warning(
+                'Replica %s is unavailable (%s); reading from primary',
+                alias, error
+            )
+            try:
+                connection.close()
+            except DatabaseError:
+                pass
+            return False
+        return True
+
+    def choose(self):
+        """Return a random healthy replica alias, or None for the primary."""
+        healthy = [
+            alias for alias in self.config['ALIASES']
+            if self.is_healthy(alias)
+        ]
+        return random.choice(healthy) if healthy else None
+
+    def reset(self):
+        with self._lock:
+            self._checked.clear()
+
+
+replica_health = ReplicaHealth()
+
+
+class ReplicaRouter:
+    """Send reads of replica-enabled requests to the request's replica.
+
+    Writes, reads inside a transaction on the primary and reads of
+    models listed in READ_REPLICAS['PRIMARY_MODELS'] always go to the
+    primary. Migrations never run on replicas.
+    """
+
+    def db_for_read(self, model, **hints):
+        alias = current_replica.get()
+        if (
+            alias is None
+            or model._meta.label_lower
+            in settings.READ_REPLICAS['PRIMARY_MODELS']
+            or connections[DEFAULT_DB_ALIAS].in_atomic_block
+        ):
+            return DEFAULT_DB_ALIAS
+        return alias
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        databases = {DEFAULT_DB_ALIAS, *settings.READ_REPLICAS['ALIASES']}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Replicas receive the schema from the primary.
+        if db in settings.READ_REPLICAS['ALIASES']:
+            return False
+        return None
+
+
+class ReplicaRoutingMiddleware:
+    """Route safe requests of replica-enabled views to a read replica.
+
+    Views opt in with `read_replica = True`. After a client sends a
+    write, its reads stay on the primary for READ_REPLICAS
+    ['STICKY_SECONDS'] so it sees its own changes despite replica lag.
+    Clients are told apart by their Authorization header or session.
+    The marker must be visible to every worker, so replicas require a
+    shared cache for READ_REPLICAS['CACHE_ALIAS'].
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if self.config['ALIASES'] and isinstance(
+            caches[self.config['CACHE_ALIAS']], (LocMemCache, DummyCache)
+        ):
+            raise ImproperlyConfigured(
+                "READ_REPLICAS['CACHE_ALIAS'] must name a cache shared by "
+                'all workers, such as Redis or Memcached; a process-local '
+                "cache loses other workers' writes and breaks "
+                'read-your-writes.'
+            )
+
+    @property
+    def config(self):
+        return settings.READ_REPLICAS
+
+    def _sticky_key(self, request):
+        identity = request.META.get('HTTP_AUTHORIZATION') or (
+            request.COOKIES.get(settings.SESSION_COOKIE_NAME)
+        )
+        if not identity:
+            return None
+        return 'db:sticky:' + hashlib.md5(
+            identity.encode(), usedforsecurity=False
+        ).hexdigest()
+
+    def __call__(self, request):
+        token = current_replica.set(None)
+        try:
+            response = self.get_response(request)
+        finally:
+            current_replica.reset(token)
+        if request.method not in SAFE_METHODS and self.config['ALIASES']:
+            key = self._sticky_key(request)
+            if key is not None:
+                caches[self.config['CACHE_ALIAS']].set(
+                    key, True, self.config['STICKY_SECONDS']
+                )
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        if (
+            not self.config['ALIASES']
+            or request.method not in SAFE_METHODS
+            or not getattr(
+                getattr(view_func, 'cls', None), 'read_replica', False
+            )
+        ):
+            return
+        key = self._sticky_key(request)
+        if key is not None and caches[self.config['CACHE_ALIAS']].get(key):
+            return
+        current_replica.set(replica_health.choose())
@@ -0,0 +1,88 @@
+import logging
+import time
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import connections
+
+logger = logging.getLogger(__name__)
+
+
+class QueryStats:
+    """Query count, total time and slowest statements of one request."""
+
+    def __init__(self, slowest_limit):
+        self.slowest_limit = slowest_limit
+        self.count = 0
+        self.duration = 0.0
+        self.slowest = []
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            duration = time.perf_counter() - started
+            self.count += 1
+            self.duration += duration
+            self.slowest.append((duration, sql))
+            self.slowest.sort(key=lambda item: item[0], reverse=True)
+            del self.slowest[self.slowest_limit:]
+
+
+class QueryBudgetMiddleware:
+    """Record the queries of each request and report budget overruns.
+
+    Views declare `query_budget` as a number or as a mapping of action
+    (or lower-case method) names to numbers; the default comes from
+    settings. Response headers are only added when enabled in settings.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        config = settings.QUERY_BUDGET
+        if not config['ENABLED']:
+            return self.get_response(request)
+
+        stats = QueryStats(config['SLOWEST'])
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(stats))
+            response = self.get_response(request)
+
+        budget = getattr(request, '_query_budget', config['DEFAULT'])
+        if stats.count > budget:
+            logger.warning(
+                '%s %s ran %d queries (budget %d) in %.2f ms; slowest: %s',
+                request.method, request.path, stats.count, budget,
+                stats.duration * 1000,
+                '; '.join(
+                    f'{duration * 1000:.2f} ms {sql}'
+                    for duration, sql in stats.slowest
+                )
+            )
+        if config['HEADERS']:
+            response['X-DB-Queries'] = stats.count
+            response['X-DB-Time'] = f'{stats.duration * 1000:.2f}'
+            response['X-DB-Slowest'] = ' | '.join(
+                f'{duration * 1000:.2f}ms {sql[:120]}'
+                for duration, sql in stats.slowest
+            )
+            timing = f'db;dur={stats.duration * 1000:.2f}'
+            response['Server-Timing'] = ', '.join(
+                filter(None, [response.get('Server-Timing'), timing])
+            )
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        default = settings.QUERY_BUDGET['DEFAULT']
+        budget = getattr(
+            getattr(view_func, 'cls', None), 'query_budget', default
+        )
+        if isinstance(budget, dict):
+            method = request.method.lower()
+            action = (getattr(view_func, 'actions', None) or {}).get(method)
+            budget = budget.get(action, budget.get(method, default))
+        request._query_budget = budget
@@ -26,6 +26,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
     'rest_framework',
     'rest_framework.authtoken',
     'djoser',
@@ -40,6 +41,8 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'foodgram_backend.query_budget.QueryBudgetMiddleware',
+    'foodgram_backend.db_router.ReplicaRoutingMiddleware',
 ]
 
 ROOT_URLCONF = 'foodgram_backend.urls'
@@ -63,19 +66,60 @@ TEMPLATES = [
 WSGI_APPLICATION = 'foodgram_backend.wsgi.application'
 
 
-DATABASES = {
-    'default': {
-        # 'ENGINE': 'django.db.backends.sqlite3',
-        # # 'NAME': '/data/db.sqlite3',
-        # 'NAME': BASE_DIR / 'db.sqlite3',
-
-        'ENGINE': 'django.db.backends.postgresql',
-        'NAME': os.getenv('POSTGRES_DB', 'django'),
-        'USER': os.getenv('POSTGRES_USER', 'django'),
-        'PASSWORD': os.getenv('POSTGRES_PASSWORD', ''),
-        'HOST': os.getenv('DB_HOST', ''),
-        'PORT': os.getenv('DB_PORT', 5432)
+if os.getenv('DB_ENGINE', 'postgresql') == 'sqlite3':
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': os.getenv('SQLITE_PATH', BASE_DIR / 'db.sqlite3'),
+        }
+    }
+    replicas = [
+        {**DATABASES['default'], 'NAME': path.strip()}
+        for path in filter(
+            None, os.getenv('DB_REPLICA_SQLITE_PATHS', '').split(',')
+        )
+    ]
+else:
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.postgresql',
+            'NAME': os.getenv('POSTGRES_DB', 'django'),
+            'USER': os.getenv('POSTGRES_USER', 'django'),
+            'PASSWORD': os.getenv('POSTGRES_PASSWORD', ''),
+            'HOST': os.getenv('DB_HOST', ''),
+            'PORT': os.getenv('DB_PORT', 5432)
+        }
     }
+    replicas = []
+    for replica in filter(
+        None, os.getenv('DB_REPLICA_HOSTS', '').split(',')
+    ):
+        host, _, port = replica.strip().partition(':')
+        replicas.append({
+            **DATABASES['default'],
+            'HOST': host,
+            'PORT': port or DATABASES['default']['PORT'],
+        })
+
+# Replicas are never migrated (see ReplicaRouter.allow_migrate); tests
+# read them through the default test database.
+for number, replica in enumerate(replicas, 1):
+    DATABASES[f'replica_{number}'] = {
+        **replica, 'TEST': {'MIRROR': 'default'}
+    }
+
+DATABASE_ROUTERS = ['foodgram_backend.db_router.ReplicaRouter']
+
+READ_REPLICAS = {
+    'ALIASES': [alias for alias in DATABASES if alias != 'default'],
+    'STICKY_SECONDS': float(os.getenv('DB_REPLICA_STICKY_SECONDS', 5)),
+    'HEALTH_CHECK_INTERVAL': float(
+        os.getenv('DB_REPLICA_HEALTH_CHECK_INTERVAL', 10)
+    ),
+    'MAX_LAG': float(os.getenv('DB_REPLICA_MAX_LAG', 5)),
+    # Holds read-your-writes markers; must be shared by all workers.
+    'CACHE_ALIAS': os.getenv('DB_REPLICA_STICKY_CACHE_ALIAS', 'default'),
+    'PRIMARY_MODELS': ['authtoken.token'],
 }
 
 AUTH_USER_MODEL = 'users.MyUser'
@@ -131,7 +175,12 @@ REST_FRAMEWORK = {
         'rest_framework.permissions.AllowAny',
     ],
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework.authentication.TokenAuthentication',
+        'users.authentication.CachedTokenAuthentication',
+    ],
+
+    'DEFAULT_RENDERER_CLASSES': [
+        'recipes.renderers.FastJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
     ],
 }
 
@@ -144,6 +193,73 @@ DJOSER = {
     },
 }
 
+RECIPE_IMAGE_RENDITION_WORKERS = int(
+    os.getenv('RECIPE_IMAGE_RENDITION_WORKERS', 2)
+)
+RECIPE_IMAGE_RENDITIONS_ASYNC = os.getenv(
+    'RECIPE_IMAGE_RENDITIONS_ASYNC', 'True'
+).lower() in ('true', '1', 't')
+
+SHOPPING_CART_PDF_FONT = os.getenv(
+    'SHOPPING_CART_PDF_FONT',
+    '/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf'
+)
+
+CACHE_BACKENDS = {
+    'locmem': 'django.core.cache.backends.locmem.LocMemCache',
+    'file': 'django.core.cache.backends.filebased.FileBasedCache',
+    'redis': 'django.core.cache.backends.redis.RedisCache',
+}
+
+CACHES = {
+    'default': {
+        'BACKEND': CACHE_BACKENDS[os.getenv('CACHE_BACKEND', 'locmem')],
+        'LOCATION': os.getenv('CACHE_LOCATION', ''),
+    }
+}
+
+CATALOG_VERSION_CHECK_INTERVAL = float(
+    os.getenv('CATALOG_VERSION_CHECK_INTERVAL', 5)
+)
+
+RECIPE_RESPONSE_CACHE = {
+    'ALIAS': os.getenv('RECIPE_RESPONSE_CACHE_ALIAS', 'default'),
+    'TIMEOUT': int(os.getenv('RECIPE_RESPONSE_CACHE_TIMEOUT', 300)),
+}
+
+TOKEN_AUTH_CACHE = {
+    'TIMEOUT': int(os.getenv('TOKEN_AUTH_CACHE_TIMEOUT', 30)),
+    'MAX_SIZE': int(os.getenv('TOKEN_AUTH_CACHE_MAX_SIZE', 10000)),
+    'ALIAS': os.getenv('TOKEN_AUTH_CACHE_ALIAS'),
+}
+
+QUERY_BUDGET = {
+    'ENABLED': os.getenv('QUERY_BUDGET_ENABLED', 'True').lower() in (
+        'true', '1', 't'
+    ),
+    'HEADERS': os.getenv('QUERY_BUDGET_HEADERS', str(DEBUG)).lower() in (
+        'true', '1', 't'
+    ),
+    'DEFAULT': int(os.getenv('QUERY_BUDGET_DEFAULT', 20)),
+    'SLOWEST': int(os.getenv('QUERY_BUDGET_SLOWEST', 3)),
+}
+
+RECIPE_POPULARITY = {
+    'HALF_LIFE_HOURS': float(
+        os.getenv('RECIPE_POPULARITY_HALF_LIFE_HOURS', 72)
+    ),
+    'FAVORITE_WEIGHT': float(
+        os.getenv('RECIPE_POPULARITY_FAVORITE_WEIGHT', 2)
+    ),
+    'CART_WEIGHT': float(os.getenv('RECIPE_POPULARITY_CART_WEIGHT', 1)),
+    'MIN_SCORE': float(os.getenv('RECIPE_POPULARITY_MIN_SCORE', 0.01)),
+    # Longest time an interaction row may take to commit after it is
+    # created; ids skipped below rows this recent are checked again.
+    'COMMIT_LAG_SECONDS': float(
+        os.getenv('RECIPE_POPULARITY_COMMIT_LAG_SECONDS', 300)
+    ),
+}
+
 CSRF_COOKIE_SAMESITE = 'None'
 
 CSRF_TRUSTED_ORIGINS = [
@@ -0,0 +1,24 @@
+import tempfile
+
+from foodgram_backend.settings import *  # noqa
+
+DATABASES = {
+    'default': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': BASE_DIR / 'db.sqlite3',  # noqa: F405
+    },
+    'replica': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': BASE_DIR / 'db.sqlite3',  # noqa: F405
+        'TEST': {'MIRROR': 'default'},
+    },
+}
+
+# Reads stay on the primary unless a test enables the replica.
+READ_REPLICAS = {**READ_REPLICAS, 'ALIASES': []}  # noqa: F405
+
+PASSWORD_HASHERS = ['django.contrib.auth.hashers.MD5PasswordHasher']
+
+MEDIA_ROOT = tempfile.mkdtemp(prefix='foodgram-media-')
+
+ALLOWED_HOSTS = ['*']
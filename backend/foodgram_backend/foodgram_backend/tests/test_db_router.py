@@ -0,0 +1,115 @@
+import shutil
+import tempfile
+from contextlib import nullcontext
+from unittest import mock
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.db import OperationalError, connections, router
+from django.test.utils import CaptureQueriesContext
+
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from foodgram_backend.db_router import ReplicaRoutingMiddleware, replica_health
+from foodgram_backend.tests.utils import (
+    FoodgramTransactionTestCase,
+    create_ingredient,
+    create_recipe,
+    create_tag,
+    create_user
+)
+
+RECIPES_URL = '/api/recipes/'
+
+
+class ReplicaRoutingTests(FoodgramTransactionTestCase):
+    databases = {'default', 'replica'}
+
+    def setUp(self):
+        super().setUp()
+        location = tempfile.mkdtemp(prefix='foodgram-cache-')
+        self.addCleanup(shutil.rmtree, location)
+        settings_override = self.settings(
+            CACHES={
+                **settings.CACHES,
+                'sticky': {
+                    'BACKEND':
+                        'django.core.cache.backends.filebased.FileBasedCache',
+                    'LOCATION': location,
+                },
+            },
+            READ_REPLICAS={
+                **settings.READ_REPLICAS,
+                'ALIASES': ['replica'],
+                'HEALTH_CHECK_INTERVAL': 0,
+                'CACHE_ALIAS': 'sticky',
+            }
+        )
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        replica_health.reset()
+        self.addCleanup(replica_health.reset)
+
+        self.user = create_user(1)
+        self.recipe = create_recipe(
+            self.user, [create_tag(1)], [(create_ingredient('Flour'), 200)]
+        )
+        self.client = APIClient()
+        self.client.credentials(
+            HTTP_AUTHORIZATION=f'Token {Token.objects.create(user=self.user)}'
+        )
+
+    def get_recipes(self, during=nullcontext()):
+        with CaptureQueriesContext(connections['default']) as primary, \
+                CaptureQueriesContext(connections['replica']) as replica, \
+                during:
+            response = self.client.get(RECIPES_URL)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            [recipe['id'] for recipe in response.data['results']],
+            [self.recipe.pk]
+        )
+        return len(primary), len(replica)
+
+    def test_reads_go_to_replica(self):
+        primary, replica = self.get_recipes()
+
+        self.assertGreater(replica, 0)
+        # Only the token lookup, a primary-only model, stays there.
+        self.assertEqual(primary, 1)
+
+    def test_reads_stick_to_primary_after_write(self):
+        response = self.client.post(
+            f'{RECIPES_URL}{self.recipe.pk}/favorite/'
+        )
+        self.assertEqual(response.status_code, 201)
+
+        primary, replica = self.get_recipes()
+
+        self.assertEqual(replica, 0)
+        self.assertGreater(primary, 1)
+
+    def test_unhealthy_replica_falls_back_to_primary(self):
+        unavailable = mock.patch.object(
+            connections['replica'], 'ensure_connection',
+            side_effect=OperationalError('connection refused')
+        )
+        with self.assertLogs('foodgram_backend.db_router', 'WARNING'):
+            primary, replica = self.get_recipes(during=unavailable)
+
+        self.assertEqual(replica, 0)
+        self.assertGreater(primary, 1)
+
+    def test_process_local_sticky_cache_is_rejected(self):
+        with self.settings(READ_REPLICAS={
+            **settings.READ_REPLICAS, 'CACHE_ALIAS': 'default'
+        }):
+            with self.assertRaisesMessage(
+                ImproperlyConfigured, 'shared by all workers'
+            ):
+                ReplicaRoutingMiddleware(lambda request: None)
+
+    def test_replicas_are_not_migrated(self):
+        self.assertFalse(router.allow_migrate('replica', 'recipes'))
+        self.assertTrue(router.allow_migrate('default', 'recipes'))
@@ -0,0 +1,209 @@
+from recipes.catalog import catalog
+from recipes.conditional import viewer_stamp_name
+from recipes.models import ChangeStamp, ShoppingCartItem, UserFavoriteRecipe
+from recipes.views import (
+    BulkFavoriteRecipeView,
+    BulkShoppingCartView,
+    FavoriteRecipeView,
+    IngredientViewSet,
+    RecipeViewSet,
+    ShoppingCartView
+)
+from rest_framework.test import APIClient
+from users.models import UserSubscription
+from users.views import MyUserViewSet
+
+from foodgram_backend.constants import (
+    INGREDIENTS_CHANGE_STAMP,
+    POPULARITY_CHANGE_STAMP,
+    RECIPES_CHANGE_STAMP,
+    TAGS_CHANGE_STAMP
+)
+from foodgram_backend.tests.utils import (
+    FoodgramTestCase,
+    assert_max_queries,
+    create_ingredient,
+    create_recipe,
+    create_tag,
+    create_user
+)
+
+PAGE_SIZES = (1, 10, 50)
+INGREDIENT_COUNTS = (2, 20, 40)
+AUTHORS = 55
+
+
+class QueryBudgetTests(FoodgramTestCase):
+    """Endpoints stay within their declared query_budget at any size.
+
+    Lists are fetched at several page sizes, so a query per row shows up
+    as a budget overrun on the larger pages. Stamp rows and the catalog
+    are prepared first, as they are in a running site.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.viewer = create_user(0)
+        cls.tags = [create_tag(number) for number in range(3)]
+        cls.ingredients = [
+            create_ingredient(f'Ingredient {number}')
+            for number in range(max(INGREDIENT_COUNTS) + 1)
+        ]
+        cls.authors = [create_user(number) for number in range(1, AUTHORS)]
+        cls.recipes = [
+            create_recipe(
+                author,
+                cls.tags[:number % 3 + 1],
+                [
+                    (ingredient, number + 1)
+                    for ingredient in cls.ingredients[number % 4:][:3]
+                ],
+                name=f'Recipe {number}'
+            )
+            for number, author in enumerate(cls.authors)
+            for _ in range(2)
+        ]
+        UserSubscription.objects.bulk_create([
+            UserSubscription(from_user=cls.viewer, to_user=author)
+            for author in cls.authors
+        ])
+        UserFavoriteRecipe.objects.bulk_create([
+            UserFavoriteRecipe(user=cls.viewer, recipe=recipe)
+            for recipe in cls.recipes[::2]
+        ])
+        ShoppingCartItem.objects.bulk_create([
+            ShoppingCartItem(user=user, recipe=cls.recipes[0])
+            for user in [cls.viewer, *cls.authors[:5]]
+        ])
+        ChangeStamp.objects.bulk_create([
+            ChangeStamp(name=name)
+            for name in (
+                TAGS_CHANGE_STAMP, INGREDIENTS_CHANGE_STAMP,
+                RECIPES_CHANGE_STAMP, POPULARITY_CHANGE_STAMP,
+                *(
+                    viewer_stamp_name(user.pk)
+                    for user in [cls.viewer, *cls.authors]
+                )
+            )
+        ], ignore_conflicts=True)
+
+    def setUp(self):
+        super().setUp()
+        catalog.tags()
+        catalog.ingredients()
+        self.client = APIClient()
+        self.client.force_authenticate(self.viewer)
+
+    def request(self, budget, method, url, data=None, status=200):
+        with assert_max_queries(budget):
+            with self.captureOnCommitCallbacks(execute=True):
+                response = getattr(self.client, method)(
+                    url, data, format='json'
+                )
+        self.assertEqual(response.status_code, status, response.content)
+        return response
+
+    def test_recipe_list(self):
+        for limit in PAGE_SIZES:
+            for query in ('', '&is_favorited=1', '&tags=tag-1', '&cursor='):
+                with self.subTest(limit=limit, query=query):
+                    response = self.request(
+                        RecipeViewSet.query_budget['list'], 'get',
+                        f'/api/recipes/?limit={limit}{query}'
+                    )
+                    self.assertEqual(
+                        len(response.json()['results']), limit
+                    )
+
+    def test_recipe_feed(self):
+        for limit in PAGE_SIZES:
+            with self.subTest(limit=limit):
+                self.request(
+                    RecipeViewSet.query_budget['feed'], 'get',
+                    f'/api/recipes/feed/?limit={limit}'
+                )
+
+    def test_recipe_detail(self):
+        self.request(
+            RecipeViewSet.query_budget['retrieve'], 'get',
+            f'/api/recipes/{self.recipes[0].pk}/'
+        )
+
+    def test_recipe_update(self):
+        recipe = self.recipes[0]
+        self.client.force_authenticate(recipe.user)
+        # Each edit changes, adds and removes ingredients of the last one.
+        for number, count in enumerate(INGREDIENT_COUNTS):
+            with self.subTest(ingredients=count):
+                self.request(
+                    RecipeViewSet.query_budget['partial_update'], 'patch',
+                    f'/api/recipes/{recipe.pk}/',
+                    {
+                        'name': f'Changed {number}',
+                        'tags': [tag.pk for tag in self.tags[number % 3:]],
+                        'ingredients': [
+                            {'id': ingredient.pk, 'amount': number + 5}
+                            for ingredient in self.ingredients[
+                                number:count + number
+                            ]
+                        ],
+                    }
+                )
+
+    def test_users_list(self):
+        for limit in PAGE_SIZES:
+            with self.subTest(limit=limit):
+                response = self.request(
+                    MyUserViewSet.query_budget['list'], 'get',
+                    f'/api/users/?limit={limit}'
+                )
+                self.assertEqual(len(response.json()['results']), limit)
+
+    def test_subscriptions(self):
+        for limit in PAGE_SIZES:
+            with self.subTest(limit=limit):
+                response = self.request(
+                    MyUserViewSet.query_budget['subscriptions'], 'get',
+                    f'/api/users/subscriptions/?limit={limit}'
+                    '&recipes_limit=1'
+                )
+                self.assertEqual(len(response.json()['results']), limit)
+
+    def test_ingredient_search(self):
+        for name in ('', 'ingr', 'ingredient 3'):
+            with self.subTest(name=name):
+                self.request(
+                    IngredientViewSet.query_budget['list'], 'get',
+                    f'/api/ingredients/?name={name}'
+                )
+
+    def test_favorite(self):
+        url = f'/api/recipes/{self.recipes[1].pk}/favorite/'
+        self.request(
+            FavoriteRecipeView.query_budget['post'], 'post', url, status=201
+        )
+        self.request(
+            FavoriteRecipeView.query_budget['delete'], 'delete', url,
+            status=204
+        )
+
+    def test_shopping_cart(self):
+        url = f'/api/recipes/{self.recipes[1].pk}/shopping_cart/'
+        self.request(ShoppingCartView.query_budget['post'], 'post', url)
+        self.request(
+            ShoppingCartView.query_budget['delete'], 'delete', url,
+            status=204
+        )
+
+    def test_bulk_favorites_and_cart(self):
+        for view, url in (
+            (BulkFavoriteRecipeView, '/api/recipes/favorite/'),
+            (BulkShoppingCartView, '/api/recipes/shopping_cart/'),
+        ):
+            for size in PAGE_SIZES:
+                ids = [recipe.pk for recipe in self.recipes[1:size + 1]]
+                with self.subTest(url=url, size=size):
+                    self.request(view.query_budget, 'post', url, {'ids': ids})
+                    self.request(
+                        view.query_budget, 'delete', url, {'ids': ids}
+                    )
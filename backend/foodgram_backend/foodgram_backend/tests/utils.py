@@ -0,0 +1,98 @@
+import base64
+from contextlib import contextmanager
+
+from django.core.cache import caches
+from django.core.files.base import ContentFile
+from django.db import connections
+from django.test import TestCase, TransactionTestCase
+from django.test.utils import CaptureQueriesContext
+
+from recipes.catalog import catalog
+from recipes.models import Ingredient, Recipe, RecipeIngredient, Tag
+from users.authentication import token_cache
+from users.models import MyUser
+
+PNG = base64.b64decode(
+    'iVBORw0KGgoAAAANSUhEUgAAAAEAAAABCAYAAAAfFcSJAAAADUlEQVR42mNk+M9QDwADhgGA'
+    'WjR9awAAAABJRU5ErkJggg=='
+)
+
+
+@contextmanager
+def assert_max_queries(max_queries, using='default'):
+    """Fail with the executed SQL if a block runs more than `max_queries`.
+
+    Intended for tests guarding endpoints against N+1 regressions.
+    """
+    with CaptureQueriesContext(connections[using]) as context:
+        yield context
+    if len(context) > max_queries:
+        raise AssertionError(
+            f'{len(context)} queries executed, expected at most '
+            f'{max_queries}:\n' + '\n'.join(
+                f'{number}. {query["sql"]}'
+                for number, query in enumerate(context.captured_queries, 1)
+            )
+        )
+
+
+def create_user(number):
+    return MyUser.objects.create_user(
+        email=f'user{number}@example.com',
+        username=f'user{number}',
+        first_name='First',
+        last_name='Last',
+        password='Secret-password-1'
+    )
+
+
+def create_tag(number):
+    return Tag.objects.create(
+        name=f'Tag {number}', slug=f'tag-{number}', color='#00FF00'
+    )
+
+
+def create_ingredient(name, measurement_unit='g'):
+    return Ingredient.objects.create(
+        name=name, measurement_unit=measurement_unit
+    )
+
+
+def create_recipe(author, tags=(), ingredients=(), name='Soup'):
+    """Create a recipe; `ingredients` are (ingredient, amount) pairs."""
+    recipe = Recipe.objects.create(
+        user=author,
+        name=name,
+        image=ContentFile(PNG, name='recipe.png'),
+        text='Boil everything.',
+        cooking_time=10
+    )
+    recipe.tags.set(tags)
+    RecipeIngredient.objects.bulk_create([
+        RecipeIngredient(recipe=recipe, ingredient=ingredient, amount=amount)
+        for ingredient, amount in ingredients
+    ])
+    return recipe
+
+
+class ClearCachesMixin:
+    """Start every test with empty process-level caches.
+
+    The catalog and caches would otherwise keep rows of earlier tests,
+    whose primary keys and stamp versions are reused after rollback.
+    """
+
+    def setUp(self):
+        super().setUp()
+        catalog.clear()
+        token_cache.clear()
+        for cache in caches.all():
+            cache.clear()
+
+
+class FoodgramTestCase(ClearCachesMixin, TestCase):
+    pass
+
+
+class FoodgramTransactionTestCase(ClearCachesMixin, TransactionTestCase):
+    pass
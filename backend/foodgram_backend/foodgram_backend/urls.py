@@ -4,6 +4,8 @@ from django.contrib import admin
 from django.urls import include, path
 
 from recipes.views import (
+    BulkFavoriteRecipeView,
+    BulkShoppingCartView,
     FavoriteRecipeView,
     IngredientViewSet,
     RecipeIngredientViewSet,
@@ -25,6 +27,16 @@ router.register(r'users', MyUserViewSet, basename='user')
 
 urlpatterns = [
     path('admin/', admin.site.urls),
+    path(
+        'api/recipes/favorite/',
+        BulkFavoriteRecipeView.as_view(),
+        name='favorite-recipes'
+    ),
+    path(
+        'api/recipes/shopping_cart/',
+        BulkShoppingCartView.as_view(),
+        name='shopping-cart-recipes'
+    ),
     path('api/', include(router.urls)),
     path('api/auth/', include('djoser.urls.authtoken')),
     path(
@@ -19,14 +19,11 @@ class RecipeAdmin(admin.ModelAdmin):
     form = RecipeAdminForm
     inlines = [RecipeIngredientInline]
     list_display = (
-        'name', 'user', 'cooking_time', 'favorite_count'
+        'name', 'user', 'cooking_time', 'favorites_count', 'cart_count'
     )
+    readonly_fields = ('favorites_count', 'cart_count')
     search_fields = ('name', 'user__username', 'tags__name')
 
-    def favorite_count(self, obj):
-        return obj.count_favorite_users()
-    favorite_count.short_description = 'Favorites'
-
 
 class IngredientAdmin(admin.ModelAdmin):
     list_display = ('name', 'measurement_unit')
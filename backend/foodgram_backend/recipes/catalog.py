@@ -0,0 +1,153 @@
+import threading
+import time
+
+from django.conf import settings
+
+from rest_framework.renderers import JSONRenderer
+
+from foodgram_backend.constants import (
+    INGREDIENTS_CHANGE_STAMP,
+    TAGS_CHANGE_STAMP
+)
+
+from .ingredient_index import IngredientIndex
+from .ingredient_snapshot import build_snapshot
+from .models import ChangeStamp, Ingredient, Tag
+
+
+def _load_tags():
+    tags = list(Tag.objects.order_by('pk'))
+    data = [
+        {'id': tag.pk, 'name': tag.name, 'color': tag.color, 'slug': tag.slug}
+        for tag in tags
+    ]
+    return {
+        'by_id': {tag.pk: tag for tag in tags},
+        'data': {entry['id']: entry for entry in data},
+        'json': JSONRenderer().render(data),
+    }
+
+
+def _load_ingredients():
+    version = ChangeStamp.get_version(INGREDIENTS_CHANGE_STAMP)
+    ingredients = list(Ingredient.objects.order_by('pk'))
+    return {
+        'snapshot': build_snapshot(version, ingredients),
+        'by_id': {ingredient.pk: ingredient for ingredient in ingredients},
+        'index': IngredientIndex(
+            {
+                'id': ingredient.pk,
+                'name': ingredient.name,
+                'measurement_unit': ingredient.measurement_unit,
+            }
+            for ingredient in ingredients
+        ),
+    }
+
+
+class Catalog:
+    """Process-local copy of tags and ingredients.
+
+    Each part is loaded on first use and dropped when its change stamp
+    moves. Stamps are re-read at most every
+    CATALOG_VERSION_CHECK_INTERVAL seconds, so writes made by other
+    workers are picked up within that interval; writes in this process
+    call `invalidate()` directly.
+    """
+
+    loaders = {
+        TAGS_CHANGE_STAMP: _load_tags,
+        INGREDIENTS_CHANGE_STAMP: _load_ingredients,
+    }
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._parts = {}
+        self._generations = dict.fromkeys(self.loaders, 0)
+        self._versions = {}
+        self._stamps = {}
+        self._checked_at = None
+
+    def invalidate(self, name):
+        with self._lock:
+            self._generations[name] += 1
+            self._parts.pop(name, None)
+            # Re-read the stamps on next use, so validators built from
+            # change_stamps() follow this process's own writes at once.
+            self._checked_at = None
+
+    def clear(self):
+        with self._lock:
+            self._parts.clear()
+            self._versions.clear()
+            self._stamps = {}
+            self._checked_at = None
+            for name in self._generations:
+                self._generations[name] += 1
+
+    def _check_versions(self):
+        now = time.monotonic()
+        interval = settings.CATALOG_VERSION_CHECK_INTERVAL
+        if self._checked_at is not None and now - self._checked_at < interval:
+            return
+        self._checked_at = now
+        stamps = {
+            stamp.name: stamp
+            for stamp in ChangeStamp.objects.filter(
+                name__in=list(self.loaders)
+            )
+        }
+        versions = {
+            name: stamps[name].version if name in stamps else 0
+            for name in self.loaders
+        }
+        with self._lock:
+            self._stamps = stamps
+            for name, version in versions.items():
+                if self._versions.get(name) != version:
+                    self._versions[name] = version
+                    self._generations[name] += 1
+                    self._parts.pop(name, None)
+
+    def _get(self, name):
+        self._check_versions()
+        part = self._parts.get(name)
+        if part is not None:
+            return part
+        generation = self._generations[name]
+        part = self.loaders[name]()
+        with self._lock:
+            if generation == self._generations[name]:
+                self._parts[name] = part
+        return part
+
+    def change_stamps(self, names):
+        """Return the stored stamps of the named parts, by name.
+
+        They are as of the last version check, so they describe the data
+        this process serves rather than the latest committed state.
+        """
+        self._check_versions()
+        stamps = self._stamps
+        return [stamps[name] for name in sorted(names) if name in stamps]
+
+    def tags(self):
+        return self._get(TAGS_CHANGE_STAMP)['by_id']
+
+    def tag_data(self):
+        return self._get(TAGS_CHANGE_STAMP)['data']
+
+    def tags_json(self):
+        return self._get(TAGS_CHANGE_STAMP)['json']
+
+    def ingredients(self):
+        return self._get(INGREDIENTS_CHANGE_STAMP)['by_id']
+
+    def ingredient_index(self):
+        return self._get(INGREDIENTS_CHANGE_STAMP)['index']
+
+    def ingredient_snapshot(self):
+        return self._get(INGREDIENTS_CHANGE_STAMP)['snapshot']
+
+
+catalog = Catalog()
@@ -0,0 +1,146 @@
+import hashlib
+from operator import attrgetter
+
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils.http import quote_etag
+from django.views.decorators.http import condition
+
+from foodgram_backend.constants import VIEWER_CHANGE_STAMP
+
+from .catalog import catalog
+from .models import ChangeStamp
+
+
+def viewer_stamp_name(user_id):
+    """Stamp of what one user sees on recipes: favorites, cart, follows."""
+    return f'{VIEWER_CHANGE_STAMP}:{user_id}'
+
+
+def accepts_gzip(request):
+    return 'gzip' in request.META.get('HTTP_ACCEPT_ENCODING', '')
+
+
+def get_change_stamps(request, names):
+    """Return the named change stamps, loaded once per request.
+
+    Stamps of catalog parts come from the catalog's periodic version
+    check instead of a query.
+    """
+    cached = getattr(request, '_change_stamps', None)
+    if cached is None:
+        cached = request._change_stamps = {}
+    key = tuple(sorted(names))
+    if key not in cached:
+        local = [name for name in key if name in catalog.loaders]
+        stamps = catalog.change_stamps(local)
+        if len(local) < len(key):
+            stamps.extend(
+                ChangeStamp.objects.filter(
+                    name__in=[name for name in key if name not in local]
+                )
+            )
+        cached[key] = sorted(stamps, key=attrgetter('name'))
+    return cached[key]
+
+
+def payload_recipes(data):
+    """Recipe dicts of a list, paginated list or detail payload."""
+    if isinstance(data, list):
+        return data
+    return data['results'] if 'results' in data else [data]
+
+
+def counters_digest(data):
+    """Digest of the favorite and cart counters shown in a payload."""
+    return hashlib.md5('|'.join(
+        f'{recipe["id"]}:{recipe["favorites_count"]}:{recipe["cart_count"]}'
+        for recipe in payload_recipes(data)
+    ).encode()).hexdigest()[:12]
+
+
+def conditional_on(*names, per_user=False, per_encoding=False,
+                   counters=False, extra_names=None):
+    """Add ETag/Last-Modified to a view from the given change stamps.
+
+    The validators are computed from stamp versions, the request path and
+    query string (and the viewer when `per_user` is set), so a 304 is
+    returned without running the view or serializing the body. Views that
+    gzip the body themselves set `per_encoding`, which gives the gzip
+    body its own ETag with a `-gz` suffix.
+
+    `extra_names` returns stamps a particular request also depends on.
+
+    Favorite and cart counters change without bumping a shared stamp, so
+    views showing them set `counters`: the view runs, the ETag gets a
+    digest of the counters in its payload and Last-Modified is left out.
+    """
+    def stamp_names(request):
+        request_names = names
+        if extra_names is not None:
+            request_names = (*request_names, *extra_names(request))
+        if per_user and request.user.is_authenticated:
+            return (*request_names, viewer_stamp_name(request.user.pk))
+        return request_names
+
+    def etag(request, *args, **kwargs):
+        parts = [request.path, request.META.get('QUERY_STRING', '')]
+        parts.extend(
+            f'{stamp.name}:{stamp.version}'
+            for stamp in get_change_stamps(request, stamp_names(request))
+        )
+        if per_user:
+            parts.append(f'user:{request.user.pk or 0}')
+        value = hashlib.md5('|'.join(parts).encode()).hexdigest()
+        if per_encoding and accepts_gzip(request):
+            value += '-gz'
+        return value
+
+    def last_modified(request, *args, **kwargs):
+        return max(
+            (
+                stamp.changed_at
+                for stamp in get_change_stamps(request, stamp_names(request))
+            ),
+            default=None
+        )
+
+    def with_counters(view):
+        def counted_view(request, *args, **kwargs):
+            response = view(request, *args, **kwargs)
+            if (
+                request.method not in ('GET', 'HEAD')
+                or response.status_code != 200
+            ):
+                return response
+            response['ETag'] = quote_etag(
+                f'{etag(request)}-{counters_digest(response.data)}'
+            )
+            return get_conditional_response(
+                request, etag=response['ETag'], response=response
+            )
+        return counted_view
+
+    def decorator(view):
+        if counters:
+            conditional_view = with_counters(view)
+        else:
+            conditional_view = condition(
+                etag_func=etag, last_modified_func=last_modified
+            )(view)
+        vary = [
+            header for header, enabled in (
+                ('Authorization', per_user),
+                ('Accept-Encoding', per_encoding),
+            )
+            if enabled
+        ]
+        if not vary:
+            return conditional_view
+
+        def varying_view(request, *args, **kwargs):
+            response = conditional_view(request, *args, **kwargs)
+            patch_vary_headers(response, vary)
+            return response
+        return varying_view
+
+    return decorator
@@ -1,6 +1,25 @@
+from django.contrib.postgres.search import (
+    SearchQuery,
+    SearchRank,
+    TrigramWordSimilarity
+)
+from django.db import connections
+from django.db.models import F, Q
+
 from django_filters import rest_framework as filters
 
-from .models import Ingredient, Recipe
+from foodgram_backend.constants import RECIPE_SEARCH_CONFIG
+
+from .catalog import catalog
+from .models import Recipe
+
+
+def get_tag_choices():
+    return [(tag.slug, tag.name) for tag in catalog.tags().values()]
+
+
+class NumberInFilter(filters.BaseInFilter, filters.NumberFilter):
+    pass
 
 
 class RecipeFilter(filters.FilterSet):
@@ -12,23 +31,28 @@ class RecipeFilter(filters.FilterSet):
         method='filter_is_in_shopping_cart', label='Is in shopping cart'
     )
 
-    tags = filters.AllValuesMultipleFilter(
-        field_name="tags__slug", label='Tags'
+    tags = filters.MultipleChoiceFilter(
+        field_name="tags__slug", label='Tags', choices=get_tag_choices
     )
 
     author = filters.NumberFilter(
         field_name="user__id", label='Author ID'
     )
 
+    search = filters.CharFilter(method='filter_search', label='Search')
+
+    ids = NumberInFilter(field_name='id', label='Recipe IDs')
+
+    ordering = filters.ChoiceFilter(
+        choices=[('popular', 'Popular')],
+        method='filter_ordering',
+        label='Ordering'
+    )
+
     class Meta:
         model = Recipe
         fields = ['tags', 'author']
 
-    def filter_queryset(self, queryset):
-        return super().filter_queryset(queryset).prefetch_related(
-            'ingredients', 'tags'
-        )
-
     def filter_is_favorited(self, queryset, name, value):
         if value and self.request.user.is_authenticated:
             return queryset.filter(userfavoriterecipe__user=self.request.user)
@@ -39,14 +63,29 @@ class RecipeFilter(filters.FilterSet):
             return queryset.filter(shopping_cart_users=self.request.user)
         return queryset
 
+    def filter_search(self, queryset, name, value):
+        value = value.strip()
+        if not value:
+            return queryset
+        if connections[queryset.db].vendor != 'postgresql':
+            return queryset.filter(
+                Q(name__icontains=value) | Q(text__icontains=value)
+            )
+        query = SearchQuery(
+            value, config=RECIPE_SEARCH_CONFIG, search_type='websearch'
+        )
+        return queryset.annotate(
+            search_rank=SearchRank(F('search_vector'), query),
+            search_similarity=TrigramWordSimilarity(value, 'name')
+        ).filter(
+            Q(search_vector=query)
+            | Q(name__trigram_word_similar=value)
+        ).order_by('-search_rank', '-search_similarity', '-created_at')
 
-class IngredientFilter(filters.FilterSet):
-    starts_with = filters.CharFilter(method='filter_starts_with')
-    name = filters.CharFilter(lookup_expr='icontains')
-
-    class Meta:
-        model = Ingredient
-        fields = ['name']
-
-    def filter_starts_with(self, queryset, name, value):
-        return queryset.filter(name__istartswith=value)
+    def filter_ordering(self, queryset, name, value):
+        if value == 'popular':
+            return queryset.order_by(
+                F('popularity__score').desc(nulls_last=True),
+                '-created_at', '-id'
+            )
+        return queryset
@@ -0,0 +1,127 @@
+import io
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import close_old_connections, transaction
+from django.utils import timezone
+
+from PIL import Image, ImageOps
+
+from foodgram_backend.constants import (
+    RECIPE_IMAGE_RENDITION_FORMATS,
+    RECIPE_IMAGE_RENDITIONS,
+    RECIPE_IMAGE_RENDITIONS_UPLOAD_TO,
+    RECIPES_CHANGE_STAMP
+)
+
+from .models import ChangeStamp, Recipe
+
+logger = logging.getLogger(__name__)
+
+_executor = None
+
+
+def _get_executor():
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=settings.RECIPE_IMAGE_RENDITION_WORKERS,
+            thread_name_prefix='recipe-images'
+        )
+    return _executor
+
+
+def _encode(image, image_format, quality):
+    if image_format == 'JPEG' and image.mode != 'RGB':
+        background = Image.new('RGB', image.size, (255, 255, 255))
+        if image.mode in ('RGBA', 'LA', 'P'):
+            image = image.convert('RGBA')
+            background.paste(image, mask=image.getchannel('A'))
+        else:
+            background.paste(image.convert('RGB'))
+        image = background
+    buffer = io.BytesIO()
+    image.save(buffer, format=image_format, quality=quality, optimize=True)
+    return buffer.getvalue()
+
+
+def delete_renditions(renditions):
+    for formats in renditions.values():
+        for path in formats.values():
+            default_storage.delete(path)
+
+
+def render_renditions(recipe_id):
+    """Write resized WebP and JPEG copies of a recipe image.
+
+    The result is only recorded if the recipe still has the image that
+    was processed; otherwise the files are discarded.
+    """
+    recipe = Recipe.objects.filter(pk=recipe_id).only(
+        'pk', 'image', 'image_renditions'
+    ).first()
+    if recipe is None or not recipe.image:
+        return
+    source = recipe.image.name
+    stem = os.path.splitext(os.path.basename(source))[0]
+
+    with default_storage.open(source, 'rb') as file:
+        original = ImageOps.exif_transpose(Image.open(file))
+        original.load()
+
+    renditions = {}
+    for name, size in RECIPE_IMAGE_RENDITIONS.items():
+        image = original.copy()
+        image.thumbnail(size, Image.LANCZOS)
+        renditions[name] = {
+            extension: default_storage.save(
+                f'{RECIPE_IMAGE_RENDITIONS_UPLOAD_TO}{stem}-{name}.'
+                f'{extension}',
+                ContentFile(_encode(image, image_format, quality))
+            )
+            for extension, (image_format, quality)
+            in RECIPE_IMAGE_RENDITION_FORMATS.items()
+        }
+
+    updated = Recipe.objects.filter(pk=recipe_id, image=source).update(
+        image_renditions=renditions, updated_at=timezone.now()
+    )
+    if updated:
+        ChangeStamp.bump_on_commit(RECIPES_CHANGE_STAMP)
+        delete_renditions(recipe.image_renditions)
+    else:
+        delete_renditions(renditions)
+
+
+def _render_in_background(recipe_id):
+    close_old_connections()
+    try:
+        render_renditions(recipe_id)
+    except Exception:
+        logger.exception(
+            'Failed to render image renditions for recipe %s', recipe_id
+        )
+    finally:
+        close_old_connections()
+
+
+def enqueue_renditions(recipe_id):
+    """Schedule rendition processing once the current transaction commits."""
+    if settings.RECIPE_IMAGE_RENDITIONS_ASYNC:
+        transaction.on_commit(
+            lambda: _get_executor().submit(_render_in_background, recipe_id)
+        )
+    else:
+        transaction.on_commit(lambda: render_renditions(recipe_id))
+
+
+def replace_renditions(recipe):
+    """Drop renditions of a replaced image and schedule new ones."""
+    old_renditions = recipe.image_renditions
+    recipe.image_renditions = {}
+    transaction.on_commit(lambda: delete_renditions(old_renditions))
+    enqueue_renditions(recipe.pk)
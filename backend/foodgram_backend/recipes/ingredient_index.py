@@ -0,0 +1,43 @@
+from bisect import bisect_left
+
+
+class IngredientIndex:
+    """Case-folded index over ingredient names.
+
+    Names are kept in a sorted array, so prefix matches are a binary
+    search plus a short scan.
+    """
+
+    def __init__(self, entries):
+        rows = sorted(
+            (entry['name'].casefold(), entry['id'], entry)
+            for entry in entries
+        )
+        self._keys = [row[0] for row in rows]
+        self._entries = [row[2] for row in rows]
+
+    def all(self):
+        return self._entries
+
+    def search(self, query, limit, substring=True):
+        """Return prefix matches first, then substring matches."""
+        keys, entries = self._keys, self._entries
+        query = query.casefold()
+        results = []
+
+        index = bisect_left(keys, query)
+        while (
+            index < len(keys) and len(results) < limit
+            and keys[index].startswith(query)
+        ):
+            results.append(entries[index])
+            index += 1
+
+        if substring:
+            for key, entry in zip(keys, entries):
+                if len(results) >= limit:
+                    break
+                if query in key and not key.startswith(query):
+                    results.append(entry)
+
+        return results
@@ -0,0 +1,57 @@
+import gzip
+
+from rest_framework.renderers import JSONRenderer
+
+from foodgram_backend.constants import INGREDIENTS_CHANGE_STAMP
+
+from .models import ChangeStamp, Ingredient, IngredientTombstone
+
+
+def encode_ingredients(ingredients):
+    """Encode ingredients as parallel arrays with dictionary-coded units."""
+    units = {}
+    columns = {'id': [], 'name': [], 'unit': []}
+    for ingredient in ingredients:
+        columns['id'].append(ingredient.pk)
+        columns['name'].append(ingredient.name)
+        columns['unit'].append(
+            units.setdefault(ingredient.measurement_unit, len(units))
+        )
+    return {'units': list(units), **columns}
+
+
+def build_snapshot(version, ingredients):
+    """Render a full snapshot once, as plain and gzip-compressed JSON."""
+    content = JSONRenderer().render({
+        'version': version,
+        'full': True,
+        'ingredients': encode_ingredients(ingredients),
+        'deleted': [],
+    })
+    return {
+        'version': version,
+        'content': content,
+        'gzip': gzip.compress(content, mtime=0),
+    }
+
+
+def build_delta(since):
+    """Return ingredients added, changed or deleted after `since`.
+
+    The version is read before the rows, so changes committed in between
+    are sent again on the next sync rather than lost.
+    """
+    version = ChangeStamp.get_version(INGREDIENTS_CHANGE_STAMP)
+    return {
+        'version': version,
+        'since': since,
+        'full': False,
+        'ingredients': encode_ingredients(
+            Ingredient.objects.filter(version__gt=since).order_by('pk')
+        ),
+        'deleted': list(
+            IngredientTombstone.objects.filter(
+                version__gt=since
+            ).order_by('pk').values_list('ingredient_id', flat=True)
+        ),
+    }
@@ -0,0 +1,283 @@
+import json
+import os
+import re
+import statistics
+import time
+
+from django.conf import settings
+from django.core.management import CommandError
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.db.models import Count
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from recipes.models import Ingredient, Recipe, Tag
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+from users.models import MyUser
+
+POSTMAN_VARIABLE = re.compile(r'{{(\w+)}}')
+
+
+def percentile(cut_points, value):
+    return cut_points[value - 1] if cut_points else 0
+
+
+class Command(BaseCommand):
+    help = (
+        'Benchmark the main API endpoints in-process and report latency '
+        'percentiles, queries per request and throughput'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--iterations',
+            type=int,
+            default=50,
+            help='Measured requests per endpoint'
+        )
+        parser.add_argument(
+            '--warmup',
+            type=int,
+            default=5,
+            help='Unmeasured requests per endpoint sent first'
+        )
+        parser.add_argument(
+            '--user',
+            help='Email of the authenticated user; defaults to the user '
+                 'with the most subscriptions'
+        )
+        parser.add_argument(
+            '--postman',
+            help='Also replay GET requests from a Postman collection'
+        )
+        parser.add_argument(
+            '--output',
+            help='Where to save results; defaults to '
+                 'benchmarks/benchmark-<timestamp>.json'
+        )
+        parser.add_argument(
+            '--compare',
+            help='Results file of an earlier run to compare against'
+        )
+
+    def handle(self, *args, **options):
+        if options['iterations'] < 2:
+            raise CommandError('At least 2 iterations are required.')
+        baseline = None
+        if options['compare']:
+            with open(options['compare'], encoding='utf-8') as file:
+                baseline = json.load(file)['results']
+
+        variables = self._get_variables(options['user'])
+        host = next(
+            (
+                host for host in settings.ALLOWED_HOSTS
+                if host != '*' and not host.startswith('.')
+            ),
+            'localhost'
+        )
+        self.clients = {
+            'anon': APIClient(HTTP_HOST=host),
+            'user': APIClient(HTTP_HOST=host),
+        }
+        self.clients['user'].credentials(
+            HTTP_AUTHORIZATION=f'Token {variables.pop("token")}'
+        )
+
+        scenarios = self._get_scenarios(variables)
+        if options['postman']:
+            scenarios.extend(
+                self._get_postman_scenarios(options['postman'], variables)
+            )
+
+        results = {}
+        for name, client_name, path in scenarios:
+            results[name] = self._run(
+                self.clients[client_name], path,
+                options['warmup'], options['iterations']
+            )
+            self._report(name, results[name], (baseline or {}).get(name))
+
+        output = options['output'] or os.path.join(
+            'benchmarks',
+            f'benchmark-{timezone.now():%Y%m%d-%H%M%S}.json'
+        )
+        os.makedirs(os.path.dirname(output) or '.', exist_ok=True)
+        with open(output, 'w', encoding='utf-8') as file:
+            json.dump({
+                'created_at': timezone.now().isoformat(),
+                'database': connection.vendor,
+                'iterations': options['iterations'],
+                'data': {
+                    'users': MyUser.objects.count(),
+                    'recipes': Recipe.objects.count(),
+                    'ingredients': Ingredient.objects.count(),
+                },
+                'results': results,
+            }, file, ensure_ascii=False, indent=2)
+        self.stdout.write(self.style.SUCCESS(f'Results saved to {output}'))
+
+    def _get_variables(self, email):
+        users = MyUser.objects.annotate(
+            subscription_count=Count('subscriptions_from')
+        ).order_by('-subscription_count', 'pk')
+        user = (
+            users.filter(email=email).first() if email else users.first()
+        )
+        recipe = Recipe.objects.order_by('-favorites_count', 'pk').first()
+        tags = list(Tag.objects.order_by('pk')[:3])
+        ingredient = Ingredient.objects.order_by('pk').first()
+        if not all((user, recipe, tags, ingredient)):
+            raise CommandError(
+                'Not enough data to benchmark; run generate_data first.'
+            )
+        token, _ = Token.objects.get_or_create(user=user)
+        tag_slugs = [tag.slug for tag in tags]
+        tag_slugs += tag_slugs[-1:] * (3 - len(tag_slugs))
+        return {
+            'token': token.key,
+            'baseUrl': '',
+            'userId': recipe.user_id,
+            'firstRecipeId': recipe.pk,
+            'firstTagId': tags[0].pk,
+            'firstTagSlug': tag_slugs[0],
+            'secondTagSlug': tag_slugs[1],
+            'thirdTagSlug': tag_slugs[2],
+            'firstIndredientId': ingredient.pk,
+            'ingredientNameFirstLatter': ingredient.name[:2],
+            'middlePage': max(
+                1, Recipe.objects.count() // settings.REST_FRAMEWORK[
+                    'PAGE_SIZE'
+                ] // 2
+            ),
+        }
+
+    def _get_scenarios(self, variables):
+        scenarios = [
+            ('recipes_anonymous', 'anon', '/api/recipes/'),
+            ('recipes', 'user', '/api/recipes/'),
+            (
+                'recipes_by_tags', 'user',
+                '/api/recipes/?tags={firstTagSlug}&tags={secondTagSlug}'
+            ),
+            ('recipes_by_author', 'user', '/api/recipes/?author={userId}'),
+            ('recipes_middle_page', 'user', '/api/recipes/?page={middlePage}'),
+            ('recipes_cursor', 'user', '/api/recipes/?cursor='),
+            ('recipes_favorited', 'user', '/api/recipes/?is_favorited=1'),
+            (
+                'recipes_by_popularity', 'user',
+                '/api/recipes/?ordering=popular'
+            ),
+            ('recipes_popular', 'anon', '/api/recipes/popular/'),
+            ('recipe_detail', 'user', '/api/recipes/{firstRecipeId}/'),
+            (
+                'ingredients_search', 'anon',
+                '/api/ingredients/?name={ingredientNameFirstLatter}'
+            ),
+            ('tags', 'anon', '/api/tags/'),
+            ('users', 'user', '/api/users/'),
+            (
+                'subscriptions', 'user',
+                '/api/users/subscriptions/?recipes_limit=3'
+            ),
+            (
+                'download_shopping_cart', 'user',
+                '/api/recipes/download_shopping_cart/'
+            ),
+        ]
+        return [
+            (name, client_name, path.format(**variables))
+            for name, client_name, path in scenarios
+        ]
+
+    def _get_postman_scenarios(self, path, variables):
+        with open(path, encoding='utf-8') as file:
+            collection = json.load(file)
+        scenarios = []
+
+        def walk(items, prefix):
+            for item in items:
+                name = f'{prefix}{item["name"]}'
+                if 'item' in item:
+                    walk(item['item'], f'{name}/')
+                    continue
+                request = item['request']
+                if request['method'] != 'GET':
+                    continue
+                url = request['url']
+                raw = url['raw'] if isinstance(url, dict) else url
+                if any(
+                    variable not in variables
+                    for variable in POSTMAN_VARIABLE.findall(raw)
+                ):
+                    continue
+                client_name = (
+                    'anon' if request.get('auth', {}).get('type') == 'noauth'
+                    else 'user'
+                )
+                scenarios.append((
+                    f'postman:{name}#{len(scenarios)}',
+                    client_name,
+                    POSTMAN_VARIABLE.sub(
+                        lambda match: str(variables[match.group(1)]), raw
+                    )
+                ))
+
+        walk(collection['item'], '')
+        return scenarios
+
+    def _request(self, client, path):
+        response = client.get(path)
+        if response.streaming:
+            b''.join(response.streaming_content)
+        return response
+
+    def _run(self, client, path, warmup, iterations):
+        for _ in range(warmup):
+            self._request(client, path)
+        latencies = []
+        queries = []
+        statuses = set()
+        for _ in range(iterations):
+            with CaptureQueriesContext(connection) as context:
+                started = time.perf_counter()
+                response = self._request(client, path)
+                latencies.append((time.perf_counter() - started) * 1000)
+            queries.append(len(context))
+            statuses.add(response.status_code)
+        cut_points = statistics.quantiles(
+            latencies, n=100, method='inclusive'
+        )
+        return {
+            'path': path,
+            'statuses': sorted(statuses),
+            'p50_ms': round(percentile(cut_points, 50), 3),
+            'p95_ms': round(percentile(cut_points, 95), 3),
+            'p99_ms': round(percentile(cut_points, 99), 3),
+            'mean_ms': round(statistics.fmean(latencies), 3),
+            'queries': round(statistics.fmean(queries), 2),
+            'throughput_rps': round(len(latencies) * 1000 / sum(latencies), 1),
+        }
+
+    def _report(self, name, result, baseline):
+        line = (
+            f'{name:<40} p50 {result["p50_ms"]:8.2f} ms  '
+            f'p95 {result["p95_ms"]:8.2f} ms  p99 {result["p99_ms"]:8.2f} ms  '
+            f'{result["queries"]:5.1f} q  {result["throughput_rps"]:7.1f} rps'
+        )
+        if baseline:
+            change = (
+                (result['p95_ms'] - baseline['p95_ms'])
+                / baseline['p95_ms'] * 100 if baseline['p95_ms'] else 0
+            )
+            line += (
+                f'  (p95 {change:+.0f}%, queries '
+                f'{result["queries"] - baseline["queries"]:+.1f})'
+            )
+        if any(status >= 400 for status in result['statuses']):
+            line = self.style.WARNING(
+                f'{line}  statuses {result["statuses"]}'
+            )
+        self.stdout.write(line)
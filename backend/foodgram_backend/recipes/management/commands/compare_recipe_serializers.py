@@ -0,0 +1,151 @@
+import time
+
+from django.conf import settings
+from django.core.management import CommandError
+from django.core.management.base import BaseCommand
+from django.db.models import Count
+
+from recipes.models import Recipe
+from recipes.renderers import FastJSONRenderer
+from recipes.serializers import RecipeRowSerializer, RecipeSerializer
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+from users.models import MyUser
+
+
+class Command(BaseCommand):
+    help = (
+        'Check that the row serializer and FastJSONRenderer produce the same '
+        'recipe list JSON as RecipeSerializer and JSONRenderer, and compare '
+        'their throughput'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--limit',
+            type=int,
+            default=100,
+            help='Recipes per page'
+        )
+        parser.add_argument(
+            '--pages',
+            type=int,
+            default=5,
+            help='Number of pages compared, newest first'
+        )
+        parser.add_argument(
+            '--iterations',
+            type=int,
+            default=5,
+            help='Timed rounds over all pages for each path'
+        )
+        parser.add_argument(
+            '--user',
+            help='Email of the viewer; defaults to the user with the most '
+                 'subscriptions, so is_subscribed varies'
+        )
+
+    def handle(self, *args, **options):
+        user = self._get_user(options['user'])
+        pages = [
+            (offset, offset + options['limit'])
+            for offset in range(
+                0, options['limit'] * options['pages'], options['limit']
+            )
+        ]
+        if not Recipe.objects.exists():
+            raise CommandError('There are no recipes to compare.')
+
+        mismatches = 0
+        for start, stop in pages:
+            expected = self._render_serializer(user, start, stop)
+            actual = self._render_rows(user, start, stop)
+            if expected != actual:
+                mismatches += 1
+                self.stderr.write(
+                    f'Recipes {start}-{stop}: output differs\n'
+                    f'  serializer: {self._excerpt(expected, actual)}\n'
+                    f'  rows:       {self._excerpt(actual, expected)}'
+                )
+        if mismatches:
+            raise CommandError(f'{mismatches} of {len(pages)} pages differ.')
+        self.stdout.write(self.style.SUCCESS(
+            f'{len(pages)} pages of up to {options["limit"]} recipes match.'
+        ))
+
+        recipes = sum(
+            Recipe.objects.all()[start:stop].count() for start, stop in pages
+        ) * options['iterations']
+        baseline = self._time(
+            self._render_serializer, user, pages, options['iterations']
+        )
+        fast = self._time(
+            self._render_rows, user, pages, options['iterations']
+        )
+        self.stdout.write(
+            f'RecipeSerializer + JSONRenderer: '
+            f'{recipes / baseline:10.0f} recipes/s\n'
+            f'RecipeRowSerializer + FastJSONRenderer: '
+            f'{recipes / fast:10.0f} recipes/s  ({baseline / fast:.1f}x)'
+        )
+
+    def _get_user(self, email):
+        users = MyUser.objects.annotate(
+            subscription_count=Count('subscriptions_from')
+        ).order_by('-subscription_count', 'pk')
+        user = users.filter(email=email).first() if email else users.first()
+        if user is None:
+            raise CommandError('User not found.')
+        return user
+
+    def _context(self, user):
+        host = next(
+            (
+                host for host in settings.ALLOWED_HOSTS
+                if host != '*' and not host.startswith('.')
+            ),
+            'localhost'
+        )
+        request = Request(
+            APIRequestFactory().get('/api/recipes/', HTTP_HOST=host)
+        )
+        request.user = user
+        return {'request': request}
+
+    def _render_serializer(self, user, start, stop):
+        queryset = Recipe.objects.for_representation(user).order_by(
+            '-created_at', '-id'
+        )[start:stop]
+        return JSONRenderer().render(RecipeSerializer(
+            queryset, many=True, context=self._context(user)
+        ).data)
+
+    def _render_rows(self, user, start, stop):
+        queryset = Recipe.objects.with_viewer_flags(user).order_by(
+            '-created_at', '-id'
+        ).values(*RecipeRowSerializer.row_fields)[start:stop]
+        return FastJSONRenderer().render(RecipeRowSerializer(
+            queryset, many=True, context=self._context(user)
+        ).data)
+
+    def _time(self, render, user, pages, iterations):
+        started = time.perf_counter()
+        for _ in range(iterations):
+            for start, stop in pages:
+                render(user, start, stop)
+        return time.perf_counter() - started
+
+    def _excerpt(self, content, other):
+        position = next(
+            (
+                index for index, (left, right) in enumerate(
+                    zip(content, other)
+                )
+                if left != right
+            ),
+            min(len(content), len(other))
+        )
+        return content[max(0, position - 80):position + 80].decode(
+            errors='replace'
+        )
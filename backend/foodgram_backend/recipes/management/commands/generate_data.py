@@ -0,0 +1,261 @@
+import io
+import random
+import time
+from datetime import timedelta
+from itertools import accumulate
+
+from django.contrib.auth.hashers import make_password
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.management import CommandError, call_command
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+from PIL import Image
+from recipes.catalog import catalog
+from recipes.models import (
+    ChangeStamp,
+    Ingredient,
+    Recipe,
+    RecipeIngredient,
+    ShoppingCartItem,
+    Tag,
+    UserFavoriteRecipe
+)
+from users.models import MyUser, UserSubscription
+
+from foodgram_backend.constants import (
+    INGREDIENTS_CHANGE_STAMP,
+    RECIPE_IMAGE_UPLOAD_TO,
+    RECIPES_CHANGE_STAMP,
+    TAGS_CHANGE_STAMP
+)
+
+MEASUREMENT_UNITS = ['г', 'кг', 'мл', 'л', 'шт.', 'ст. л.', 'ч. л.']
+WORDS = [
+    'суп', 'салат', 'пирог', 'каша', 'рагу', 'соус', 'запеканка',
+    'томатный', 'куриный', 'грибной', 'овощной', 'сырный', 'домашний',
+    'быстрый', 'острый', 'сладкий', 'летний', 'зимний', 'праздничный',
+]
+
+
+class ZipfSampler:
+    """Pick items with probability proportional to 1 / rank ** skew."""
+
+    def __init__(self, items, skew, rng):
+        self.items = list(items)
+        self.rng = rng
+        self.cum_weights = list(accumulate(
+            1 / rank ** skew for rank in range(1, len(self.items) + 1)
+        ))
+
+    def sample(self, count):
+        count = min(count, len(self.items))
+        chosen = set()
+        while len(chosen) < count:
+            chosen.update(self.rng.choices(
+                self.items, cum_weights=self.cum_weights,
+                k=count - len(chosen)
+            ))
+        return chosen
+
+
+class Command(BaseCommand):
+    help = 'Generate synthetic users, recipes and interactions for load tests'
+
+    def add_arguments(self, parser):
+        for name, default, help_text in (
+            ('users', 1000, 'Number of users to create'),
+            ('recipes', 10000, 'Number of recipes to create'),
+            ('ingredients', 2000, 'Number of ingredients to create'),
+            ('tags', 12, 'Number of tags to create'),
+            ('favorites', 20, 'Average favorites per user'),
+            ('cart', 5, 'Average shopping cart items per user'),
+            ('subscriptions', 10, 'Average subscriptions per user'),
+            ('batch-size', 2000, 'Number of rows inserted per query'),
+        ):
+            parser.add_argument(
+                f'--{name}', type=int, default=default, help=help_text
+            )
+        parser.add_argument(
+            '--skew',
+            type=float,
+            default=1.1,
+            help='Zipf exponent for author, recipe and ingredient popularity'
+        )
+        parser.add_argument(
+            '--seed',
+            type=int,
+            default=0,
+            help='Random seed, so runs are reproducible'
+        )
+        parser.add_argument(
+            '--password',
+            default='benchmark-password',
+            help='Password set for every generated user'
+        )
+
+    def handle(self, *args, **options):
+        for name in ('users', 'recipes', 'ingredients', 'tags'):
+            if options[name] < 1:
+                raise CommandError(f'--{name} must be a positive number.')
+        self.rng = random.Random(options['seed'])
+        self.batch_size = options['batch_size']
+        self.skew = options['skew']
+        self.run_id = f'{int(time.time()):x}'
+        started = time.monotonic()
+
+        with transaction.atomic():
+            users = self._create_users(options['users'], options['password'])
+            tags = self._create_tags(options['tags'])
+            ingredients = self._create_ingredients(options['ingredients'])
+            recipes = self._create_recipes(
+                options['recipes'], users, tags, ingredients
+            )
+            self._create_user_pairs(
+                UserFavoriteRecipe, 'recipe_id', users, recipes,
+                options['favorites']
+            )
+            self._create_user_pairs(
+                ShoppingCartItem, 'recipe_id', users, recipes,
+                options['cart']
+            )
+            self._create_subscriptions(users, options['subscriptions'])
+
+        self.stdout.write('Recomputing counters and shopping lists...')
+        call_command('reconcile_recipe_counters', stdout=io.StringIO())
+        call_command('rebuild_shopping_lists', stdout=io.StringIO())
+        call_command('refresh_recipe_popularity', stdout=io.StringIO())
+        Recipe.objects.filter(pk__in=recipes).update_search_vector()
+        for name in (
+            TAGS_CHANGE_STAMP, INGREDIENTS_CHANGE_STAMP, RECIPES_CHANGE_STAMP
+        ):
+            ChangeStamp.bump(name)
+        catalog.invalidate(TAGS_CHANGE_STAMP)
+        catalog.invalidate(INGREDIENTS_CHANGE_STAMP)
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Generated data in {time.monotonic() - started:.1f}s'
+        ))
+
+    def _bulk_create(self, model, objects):
+        created = model.objects.bulk_create(
+            objects, batch_size=self.batch_size
+        )
+        self.stdout.write(f'{model.__name__}: {len(created)} rows')
+        return created
+
+    def _activity(self, average):
+        """Per-user activity count with a long tail."""
+        if average <= 0:
+            return 0
+        return int(self.rng.expovariate(1 / average))
+
+    def _create_users(self, count, password):
+        password = make_password(password)
+        users = self._bulk_create(MyUser, [
+            MyUser(
+                email=f'user{self.run_id}-{number}@example.com',
+                username=f'user{self.run_id}-{number}',
+                first_name=f'Имя{number}',
+                last_name=f'Фамилия{number}',
+                password=password
+            )
+            for number in range(count)
+        ])
+        return [user.pk for user in users]
+
+    def _create_tags(self, count):
+        tags = self._bulk_create(Tag, [
+            Tag(
+                name=f'Тег {self.run_id}-{number}',
+                slug=f'tag-{self.run_id}-{number}',
+                color='#{:06x}'.format(self.rng.randrange(0x1000000))
+            )
+            for number in range(count)
+        ])
+        return [tag.pk for tag in tags]
+
+    def _create_ingredients(self, count):
+        version = ChangeStamp.next_version(INGREDIENTS_CHANGE_STAMP)
+        ingredients = self._bulk_create(Ingredient, [
+            Ingredient(
+                name=f'{self.rng.choice(WORDS)} ингредиент '
+                     f'{self.run_id}-{number}',
+                measurement_unit=self.rng.choice(MEASUREMENT_UNITS),
+                version=version
+            )
+            for number in range(count)
+        ])
+        return [ingredient.pk for ingredient in ingredients]
+
+    def _placeholder_image(self):
+        buffer = io.BytesIO()
+        Image.new('RGB', (600, 400), (230, 200, 160)).save(
+            buffer, format='JPEG'
+        )
+        return default_storage.save(
+            f'{RECIPE_IMAGE_UPLOAD_TO}synthetic.jpg',
+            ContentFile(buffer.getvalue())
+        )
+
+    def _create_recipes(self, count, users, tags, ingredients):
+        image = self._placeholder_image()
+        authors = ZipfSampler(users, self.skew, self.rng)
+        recipes = self._bulk_create(Recipe, [
+            Recipe(
+                user_id=authors.sample(1).pop(),
+                name=' '.join(self.rng.sample(WORDS, 3)).capitalize(),
+                text=' '.join(self.rng.choices(WORDS, k=40)),
+                cooking_time=self.rng.randint(5, 180),
+                image=image
+            )
+            for _ in range(count)
+        ])
+
+        now = timezone.now()
+        for recipe in recipes:
+            recipe.created_at = now - timedelta(
+                seconds=self.rng.randrange(365 * 24 * 60 * 60)
+            )
+        Recipe.objects.bulk_update(
+            recipes, ['created_at'], batch_size=self.batch_size
+        )
+
+        tag_sampler = ZipfSampler(tags, self.skew, self.rng)
+        ingredient_sampler = ZipfSampler(ingredients, self.skew, self.rng)
+        self._bulk_create(Recipe.tags.through, [
+            Recipe.tags.through(recipe_id=recipe.pk, tag_id=tag_id)
+            for recipe in recipes
+            for tag_id in tag_sampler.sample(self.rng.randint(1, 3))
+        ])
+        self._bulk_create(RecipeIngredient, [
+            RecipeIngredient(
+                recipe_id=recipe.pk,
+                ingredient_id=ingredient_id,
+                amount=self.rng.randint(1, 500)
+            )
+            for recipe in recipes
+            for ingredient_id in ingredient_sampler.sample(
+                self.rng.randint(3, 12)
+            )
+        ])
+        return [recipe.pk for recipe in recipes]
+
+    def _create_user_pairs(self, model, field, users, targets, average):
+        sampler = ZipfSampler(targets, self.skew, self.rng)
+        self._bulk_create(model, [
+            model(user_id=user_id, **{field: target_id})
+            for user_id in users
+            for target_id in sampler.sample(self._activity(average))
+        ])
+
+    def _create_subscriptions(self, users, average):
+        sampler = ZipfSampler(users, self.skew, self.rng)
+        self._bulk_create(UserSubscription, [
+            UserSubscription(from_user_id=user_id, to_user_id=author_id)
+            for user_id in users
+            for author_id in sampler.sample(self._activity(average))
+            if author_id != user_id
+        ])
@@ -1,40 +1,173 @@
+import csv
 import json
 import os
+import time
 
 from django.core.management import CommandError
 from django.core.management.base import BaseCommand
+from django.db import transaction
 
-from recipes.models import Ingredient
+from recipes.catalog import catalog
+from recipes.models import ChangeStamp, Ingredient
+
+from foodgram_backend.constants import INGREDIENTS_CHANGE_STAMP
+
+READ_CHUNK_SIZE = 64 * 1024
+
+
+def iter_json_array(file):
+    """Yield items of a top-level JSON array without loading the file."""
+    decoder = json.JSONDecoder()
+    buffer = ''
+    position = 0
+    started = False
+    eof = False
+
+    while True:
+        while position < len(buffer) and buffer[position] in ' \t\r\n,':
+            position += 1
+        if not started and position < len(buffer):
+            if buffer[position] != '[':
+                raise ValueError('Expected a JSON array of ingredients.')
+            started = True
+            position += 1
+            continue
+        if started and position < len(buffer) and buffer[position] == ']':
+            return
+        try:
+            item, end = decoder.raw_decode(buffer, position)
+        except json.JSONDecodeError:
+            if eof:
+                raise ValueError('Unexpected end of JSON data.')
+            chunk = file.read(READ_CHUNK_SIZE)
+            eof = not chunk
+            buffer = buffer[position:] + chunk
+            position = 0
+            continue
+        yield item
+        position = end
+
+
+def iter_csv_rows(file):
+    for row in csv.reader(file):
+        if not row or row == ['name', 'measurement_unit']:
+            continue
+        yield {'name': row[0], 'measurement_unit': row[1]}
+
+
+def iter_batches(items, batch_size):
+    batch = []
+    for item in items:
+        batch.append(item)
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
 
 
 class Command(BaseCommand):
-    help = 'Import ingredients from JSON file'
+    help = 'Import ingredients from a JSON or CSV file'
 
     def add_arguments(self, parser):
         parser.add_argument(
-            'json_file_path',
+            'file_path',
             type=str,
-            help='Path to the JSON file with ingredients data'
+            help='Path to the JSON or CSV file with ingredients data'
+        )
+        parser.add_argument(
+            '--format',
+            choices=['json', 'csv'],
+            help='Input format; detected from the file extension by default'
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Number of ingredients inserted per query'
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Parse the file and report what would be created'
         )
 
     def handle(self, *args, **options):
-        json_file_path = options['json_file_path']
+        file_path = options['file_path']
+        batch_size = options['batch_size']
+        dry_run = options['dry_run']
+        file_format = options['format'] or (
+            'csv' if file_path.lower().endswith('.csv') else 'json'
+        )
 
-        if not os.path.isfile(json_file_path):
+        if not os.path.isfile(file_path):
             raise CommandError(
-                f'The specified file "{json_file_path}" does not exist.'
+                f'The specified file "{file_path}" does not exist.'
             )
+        if batch_size < 1:
+            raise CommandError('Batch size must be a positive number.')
 
-        with open(json_file_path, 'r') as file:
-            data = json.load(file)
+        started = time.monotonic()
+        processed = created = 0
+        # Pairs created (or, in a dry run, counted) by earlier batches.
+        seen = set()
 
-            for item in data:
-                ingredient = Ingredient.objects.create(
-                    name=item['name'],
-                    measurement_unit=item['measurement_unit']
-                )
-                self.stdout.write(
-                    self.style.SUCCESS(f'Ingredient "{ingredient}" created')
+        with open(file_path, 'r', encoding='utf-8', newline='') as file:
+            items = (
+                iter_csv_rows(file) if file_format == 'csv'
+                else iter_json_array(file)
+            )
+            try:
+                for batch in iter_batches(items, batch_size):
+                    processed += len(batch)
+                    created += self._import_batch(batch, dry_run, seen)
+            except (ValueError, KeyError, IndexError) as error:
+                raise CommandError(
+                    f'Invalid ingredient data after {processed} items: '
+                    f'{error!r}'
                 )
 
-        self.stdout.write(self.style.SUCCESS('Import completed successfully'))
+        if created and not dry_run:
+            catalog.invalidate(INGREDIENTS_CHANGE_STAMP)
+
+        elapsed = time.monotonic() - started
+        rate = processed / elapsed if elapsed else processed
+        self.stdout.write(self.style.SUCCESS(
+            '{}{} ingredients processed, {} {}, {} already present '
+            'in {:.2f}s ({:.0f} items/s)'.format(
+                'Dry run: ' if dry_run else '',
+                processed,
+                created,
+                'would be created' if dry_run else 'created',
+                processed - created,
+                elapsed,
+                rate
+            )
+        ))
+
+    def _import_batch(self, batch, dry_run, seen):
+        pairs = {
+            (item['name'].strip(), item['measurement_unit'].strip())
+            for item in batch
+        }
+        existing = set(
+            Ingredient.objects.filter(
+                name__in={name for name, _ in pairs}
+            ).values_list('name', 'measurement_unit')
+        )
+        new_pairs = sorted(pairs - existing - seen)
+        seen.update(new_pairs)
+        if dry_run or not new_pairs:
+            return len(new_pairs)
+        with transaction.atomic():
+            version = ChangeStamp.next_version(INGREDIENTS_CHANGE_STAMP)
+            Ingredient.objects.bulk_create(
+                [
+                    Ingredient(
+                        name=name, measurement_unit=unit, version=version
+                    )
+                    for name, unit in new_pairs
+                ],
+                ignore_conflicts=True
+            )
+        return len(new_pairs)
@@ -0,0 +1,80 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from recipes.models import ShoppingCartItem, ShoppingListIngredient
+from recipes.shopping_cart import get_expected_shopping_lists
+
+
+class Command(BaseCommand):
+    help = 'Rebuild or verify per-user shopping list totals'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--verify',
+            action='store_true',
+            help='Only report users whose totals differ from their cart'
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=500,
+            help='Number of users processed per transaction'
+        )
+
+    def handle(self, *args, **options):
+        verify = options['verify']
+        batch_size = options['batch_size']
+
+        user_ids = sorted(
+            set(
+                ShoppingCartItem.objects.values_list('user_id', flat=True)
+            ) | set(
+                ShoppingListIngredient.objects.values_list(
+                    'user_id', flat=True
+                )
+            )
+        )
+        mismatched = 0
+
+        for start in range(0, len(user_ids), batch_size):
+            batch = user_ids[start:start + batch_size]
+            with transaction.atomic():
+                expected = get_expected_shopping_lists(batch)
+                actual = {
+                    (user_id, ingredient_id): total_amount
+                    for user_id, ingredient_id, total_amount
+                    in ShoppingListIngredient.objects.select_for_update(
+                    ).filter(user_id__in=batch).values_list(
+                        'user_id', 'ingredient_id', 'total_amount'
+                    )
+                }
+                stale = {
+                    user_id for (user_id, _), _
+                    in expected.items() ^ actual.items()
+                }
+                mismatched += len(stale)
+                if verify or not stale:
+                    continue
+                ShoppingListIngredient.objects.filter(
+                    user_id__in=stale
+                ).delete()
+                ShoppingListIngredient.objects.bulk_create([
+                    ShoppingListIngredient(
+                        user_id=user_id,
+                        ingredient_id=ingredient_id,
+                        total_amount=total
+                    )
+                    for (user_id, ingredient_id), total in expected.items()
+                    if user_id in stale
+                ])
+
+        if verify:
+            style = self.style.WARNING if mismatched else self.style.SUCCESS
+            self.stdout.write(style(
+                f'{mismatched} of {len(user_ids)} shopping lists differ '
+                'from their carts'
+            ))
+            return
+        self.stdout.write(self.style.SUCCESS(
+            f'Rebuilt {mismatched} of {len(user_ids)} shopping lists'
+        ))
@@ -0,0 +1,39 @@
+from django.conf import settings
+from django.core.management import CommandError
+from django.core.management.base import BaseCommand
+
+from recipes.response_cache import recipe_response_cache
+
+
+class Command(BaseCommand):
+    help = 'Show hit ratio and latency of the recipe response cache'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--reset',
+            action='store_true',
+            help='Reset the counters after printing them'
+        )
+
+    def handle(self, *args, **options):
+        if not recipe_response_cache.shares_stats:
+            raise CommandError(
+                'Cache alias "{}" is local to each process, so its counters '
+                'are not visible here. Point RECIPE_RESPONSE_CACHE_ALIAS at '
+                'a shared backend (redis or file) to collect them.'.format(
+                    settings.RECIPE_RESPONSE_CACHE['ALIAS']
+                )
+            )
+        stats = recipe_response_cache.stats()
+        hits, misses = stats['hits'], stats['misses']
+        total = hits + misses
+        self.stdout.write(
+            f'Requests: {total}, hits: {hits}, misses: {misses}, '
+            f'hit ratio: {hits / total if total else 0:.1%}'
+        )
+        for name, count in (('hit', hits), ('miss', misses)):
+            average = stats[f'{name}_time_us'] / count / 1000 if count else 0
+            self.stdout.write(f'Average {name} time: {average:.2f} ms')
+        if options['reset']:
+            recipe_response_cache.reset_stats()
+            self.stdout.write(self.style.SUCCESS('Counters reset'))
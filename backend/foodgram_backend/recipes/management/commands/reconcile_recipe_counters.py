@@ -0,0 +1,71 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count
+
+from recipes.models import Recipe, ShoppingCartItem, UserFavoriteRecipe
+
+
+class Command(BaseCommand):
+    help = 'Fix drift in Recipe.favorites_count and Recipe.cart_count'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Number of recipes checked per transaction'
+        )
+
+    def _count_by_recipe(self, model, recipe_ids):
+        return dict(
+            model.objects.filter(
+                recipe_id__in=recipe_ids
+            ).values('recipe_id').annotate(
+                total=Count('id')
+            ).values_list('recipe_id', 'total')
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        last_id = 0
+        checked = fixed = 0
+
+        while True:
+            with transaction.atomic():
+                recipes = list(
+                    Recipe.objects.select_for_update().filter(
+                        pk__gt=last_id
+                    ).order_by('pk').only(
+                        'pk', 'favorites_count', 'cart_count'
+                    )[:batch_size]
+                )
+                if not recipes:
+                    break
+                recipe_ids = [recipe.pk for recipe in recipes]
+                favorites = self._count_by_recipe(
+                    UserFavoriteRecipe, recipe_ids
+                )
+                carts = self._count_by_recipe(ShoppingCartItem, recipe_ids)
+
+                stale = []
+                for recipe in recipes:
+                    favorites_count = favorites.get(recipe.pk, 0)
+                    cart_count = carts.get(recipe.pk, 0)
+                    if (
+                        recipe.favorites_count != favorites_count
+                        or recipe.cart_count != cart_count
+                    ):
+                        recipe.favorites_count = favorites_count
+                        recipe.cart_count = cart_count
+                        stale.append(recipe)
+                Recipe.objects.bulk_update(
+                    stale, ['favorites_count', 'cart_count']
+                )
+
+            checked += len(recipes)
+            fixed += len(stale)
+            last_id = recipe_ids[-1]
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Checked {checked} recipes, fixed {fixed}'
+        ))
@@ -0,0 +1,163 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management import CommandError
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Max
+from django.utils import timezone
+
+from recipes.models import ChangeStamp, PopularityWatermark, RecipePopularity
+from recipes.popularity import SOURCES, add_log_scores, log_score, score_floor
+
+from foodgram_backend.constants import POPULARITY_CHANGE_STAMP
+
+
+class Command(BaseCommand):
+    help = (
+        'Fold favorites and shopping cart additions made since the last run '
+        'into time-decayed recipe popularity scores'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=10000,
+            help='Number of interaction rows folded per transaction'
+        )
+        parser.add_argument(
+            '--rebuild',
+            action='store_true',
+            help='Drop all scores and recompute them from every interaction, '
+                 'e.g. after changing the half-life or weights'
+        )
+
+    def handle(self, *args, **options):
+        config = settings.RECIPE_POPULARITY
+        if config['HALF_LIFE_HOURS'] <= 0 or config['MIN_SCORE'] <= 0 or any(
+            config[weight] <= 0 for *_, weight in SOURCES
+        ):
+            raise CommandError(
+                'RECIPE_POPULARITY half-life, weights and minimum score must '
+                'be positive.'
+            )
+        if config['COMMIT_LAG_SECONDS'] < 0:
+            raise CommandError(
+                'RECIPE_POPULARITY commit lag must not be negative.'
+            )
+        if options['rebuild']:
+            with transaction.atomic():
+                RecipePopularity.objects.all().delete()
+                PopularityWatermark.objects.all().delete()
+
+        folded = 0
+        for source, model, time_field, weight in SOURCES:
+            source_folded = self._fold(
+                source, model, time_field, config[weight],
+                options['batch_size']
+            )
+            self.stdout.write(f'{source}: {source_folded} rows')
+            folded += source_folded
+
+        pruned, _ = RecipePopularity.objects.filter(
+            score__lt=score_floor(timezone.now())
+        ).delete()
+        if folded or pruned or options['rebuild']:
+            ChangeStamp.bump(POPULARITY_CHANGE_STAMP)
+        self.stdout.write(self.style.SUCCESS(
+            f'Folded {folded} interactions, pruned {pruned} faded recipes'
+        ))
+
+    def _fold(self, source, model, time_field, weight, batch_size):
+        # Rows added while the command runs are left for the next run.
+        upper = model.objects.aggregate(last_id=Max('pk'))['last_id'] or 0
+        settled = (timezone.now() - timedelta(
+            seconds=settings.RECIPE_POPULARITY['COMMIT_LAG_SECONDS']
+        )).timestamp()
+        PopularityWatermark.objects.get_or_create(source=source)
+        folded = self._fold_gaps(source, model, time_field, weight, settled)
+
+        while True:
+            with transaction.atomic():
+                watermark = PopularityWatermark.objects.select_for_update(
+                ).get(source=source)
+                rows = list(
+                    model.objects.filter(
+                        pk__gt=watermark.last_id, pk__lte=upper
+                    ).order_by('pk').values_list(
+                        'pk', 'recipe_id', time_field
+                    )[:batch_size]
+                )
+                if not rows:
+                    break
+
+                # Ids skipped below a recent row may belong to
+                # transactions that have not committed yet.
+                previous = watermark.last_id
+                for pk, _, moment in rows:
+                    if moment.timestamp() > settled:
+                        watermark.gaps.extend(
+                            [gap, moment.timestamp()]
+                            for gap in range(previous + 1, pk)
+                        )
+                    previous = pk
+                self._add_scores(rows, weight)
+                watermark.last_id = rows[-1][0]
+                watermark.refreshed_at = timezone.now()
+                watermark.save(
+                    update_fields=['last_id', 'gaps', 'refreshed_at']
+                )
+
+            folded += len(rows)
+        return folded
+
+    def _fold_gaps(self, source, model, time_field, weight, settled):
+        """Fold rows that committed into gaps below the watermark.
+
+        Gaps are forgotten once the row above them is older than
+        COMMIT_LAG_SECONDS: their ids were rolled back or deleted.
+        """
+        with transaction.atomic():
+            watermark = PopularityWatermark.objects.select_for_update().get(
+                source=source
+            )
+            if not watermark.gaps:
+                return 0
+            rows = list(
+                model.objects.filter(
+                    pk__in=[pk for pk, _ in watermark.gaps]
+                ).values_list('pk', 'recipe_id', time_field)
+            )
+            self._add_scores(rows, weight)
+            found = {pk for pk, *_ in rows}
+            watermark.gaps = [
+                [pk, seen] for pk, seen in watermark.gaps
+                if pk not in found and seen > settled
+            ]
+            watermark.save(update_fields=['gaps'])
+        return len(rows)
+
+    def _add_scores(self, rows, weight):
+        scores = {}
+        for _, recipe_id, moment in rows:
+            scores[recipe_id] = add_log_scores(
+                scores.get(recipe_id), log_score(weight, moment)
+            )
+        existing = dict(
+            RecipePopularity.objects.filter(
+                recipe_id__in=scores
+            ).values_list('recipe_id', 'score')
+        )
+        RecipePopularity.objects.bulk_create(
+            [
+                RecipePopularity(
+                    recipe_id=recipe_id,
+                    score=add_log_scores(existing.get(recipe_id), score)
+                )
+                for recipe_id, score in scores.items()
+            ],
+            update_conflicts=True,
+            unique_fields=['recipe'],
+            update_fields=['score']
+        )
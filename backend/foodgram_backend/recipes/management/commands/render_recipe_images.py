@@ -0,0 +1,36 @@
+from django.core.management.base import BaseCommand
+
+from recipes.images import render_renditions
+from recipes.models import Recipe
+
+
+class Command(BaseCommand):
+    help = 'Render resized WebP and JPEG copies of recipe images'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--all',
+            action='store_true',
+            help='Re-render recipes that already have renditions'
+        )
+
+    def handle(self, *args, **options):
+        recipes = Recipe.objects.exclude(image='')
+        if not options['all']:
+            recipes = recipes.filter(image_renditions={})
+
+        rendered = failed = 0
+        for recipe_id in recipes.values_list('pk', flat=True).iterator():
+            try:
+                render_renditions(recipe_id)
+            except Exception as error:
+                failed += 1
+                self.stderr.write(
+                    self.style.ERROR(f'Recipe {recipe_id}: {error}')
+                )
+                continue
+            rendered += 1
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Rendered images for {rendered} recipes, {failed} failed'
+        ))
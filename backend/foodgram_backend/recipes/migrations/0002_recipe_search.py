@@ -0,0 +1,48 @@
+# Generated by Django 4.2.7 on 2026-10-18 16:36
+
+import django.contrib.postgres.search
+from django.db import migrations
+
+
+def create_search_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    schema_editor.execute(
+        'CREATE INDEX recipes_recipe_search_vector_gin '
+        'ON recipes_recipe USING gin (search_vector)'
+    )
+    schema_editor.execute(
+        'CREATE INDEX recipes_recipe_name_trgm '
+        'ON recipes_recipe USING gin (name gin_trgm_ops)'
+    )
+    schema_editor.execute(
+        "UPDATE recipes_recipe SET search_vector = "
+        "setweight(to_tsvector('russian', coalesce(name, '')), 'A') || "
+        "setweight(to_tsvector('russian', coalesce(text, '')), 'B')"
+    )
+
+
+def drop_search_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute(
+        'DROP INDEX IF EXISTS recipes_recipe_search_vector_gin'
+    )
+    schema_editor.execute('DROP INDEX IF EXISTS recipes_recipe_name_trgm')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.RunPython(create_search_indexes, drop_search_indexes),
+    ]
@@ -0,0 +1,54 @@
+# Generated by Django 4.2.7 on 2026-10-18 16:38
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def fill_shopping_lists(apps, schema_editor):
+    ShoppingCartItem = apps.get_model('recipes', 'ShoppingCartItem')
+    ShoppingListIngredient = apps.get_model(
+        'recipes', 'ShoppingListIngredient'
+    )
+    totals = ShoppingCartItem.objects.exclude(
+        recipe__recipe_ingredients=None
+    ).values(
+        'user_id', ingredient_id=models.F(
+            'recipe__recipe_ingredients__ingredient_id'
+        )
+    ).annotate(total=models.Sum('recipe__recipe_ingredients__amount'))
+    ShoppingListIngredient.objects.bulk_create(
+        (
+            ShoppingListIngredient(
+                user_id=row['user_id'],
+                ingredient_id=row['ingredient_id'],
+                total_amount=row['total']
+            ) for row in totals.iterator()
+        ),
+        batch_size=1000
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('recipes', '0003_recipe_updated_at'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ShoppingListIngredient',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('total_amount', models.IntegerField()),
+                ('ingredient', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='recipes.ingredient')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='shopping_list', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='shoppinglistingredient',
+            constraint=models.UniqueConstraint(fields=('user', 'ingredient'), name='unique_shopping_list_ingredient'),
+        ),
+        migrations.RunPython(fill_shopping_lists, migrations.RunPython.noop),
+    ]
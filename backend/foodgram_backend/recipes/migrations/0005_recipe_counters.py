@@ -0,0 +1,50 @@
+# Generated by Django 4.2.7 on 2026-10-18 16:39
+
+from django.db import migrations, models
+from django.db.models.functions import Coalesce
+
+
+def count_subquery(model):
+    return Coalesce(
+        models.Subquery(
+            model.objects.filter(
+                recipe=models.OuterRef('pk')
+            ).values('recipe').annotate(
+                total=models.Count('id')
+            ).values('total')
+        ),
+        0
+    )
+
+
+def fill_counters(apps, schema_editor):
+    Recipe = apps.get_model('recipes', 'Recipe')
+    Recipe.objects.update(
+        favorites_count=count_subquery(
+            apps.get_model('recipes', 'UserFavoriteRecipe')
+        ),
+        cart_count=count_subquery(
+            apps.get_model('recipes', 'ShoppingCartItem')
+        )
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0004_shopping_list_ingredient'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='cart_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='favorites_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(fill_counters, migrations.RunPython.noop),
+    ]
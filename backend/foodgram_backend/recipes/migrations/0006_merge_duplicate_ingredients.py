@@ -0,0 +1,53 @@
+# Generated by Django 4.2.7 on 2026-10-18 16:40
+
+from django.db import migrations, models
+
+
+def merge_duplicate_ingredients(apps, schema_editor):
+    Ingredient = apps.get_model('recipes', 'Ingredient')
+    RecipeIngredient = apps.get_model('recipes', 'RecipeIngredient')
+    ShoppingListIngredient = apps.get_model(
+        'recipes', 'ShoppingListIngredient'
+    )
+    duplicates = Ingredient.objects.values(
+        'name', 'measurement_unit'
+    ).annotate(
+        keep_id=models.Min('id'), total=models.Count('id')
+    ).filter(total__gt=1)
+
+    for group in duplicates:
+        duplicate_ids = list(
+            Ingredient.objects.filter(
+                name=group['name'],
+                measurement_unit=group['measurement_unit']
+            ).exclude(pk=group['keep_id']).values_list('pk', flat=True)
+        )
+        RecipeIngredient.objects.filter(
+            ingredient_id__in=duplicate_ids
+        ).update(ingredient_id=group['keep_id'])
+        for item in ShoppingListIngredient.objects.filter(
+            ingredient_id__in=duplicate_ids
+        ):
+            kept, created = ShoppingListIngredient.objects.get_or_create(
+                user_id=item.user_id,
+                ingredient_id=group['keep_id'],
+                defaults={'total_amount': item.total_amount}
+            )
+            if not created:
+                kept.total_amount += item.total_amount
+                kept.save(update_fields=['total_amount'])
+            item.delete()
+        Ingredient.objects.filter(pk__in=duplicate_ids).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0005_recipe_counters'),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            merge_duplicate_ingredients, migrations.RunPython.noop
+        ),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 4.2.7 on 2026-10-18 16:44
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0008_recipe_image_renditions'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ChangeStamp',
+            fields=[
+                ('name', models.CharField(max_length=100, primary_key=True, serialize=False)),
+                ('version', models.PositiveBigIntegerField(default=0)),
+                ('changed_at', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 4.2.7 on 2026-10-18 16:53
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0010_recipe_created_at_id_idx'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='recipe',
+            index=models.Index(fields=['user', '-created_at', '-id'], name='recipe_user_created_at_idx'),
+        ),
+    ]
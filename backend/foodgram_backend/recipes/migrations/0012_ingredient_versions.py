@@ -0,0 +1,25 @@
+# Generated by Django 4.2.7 on 2026-10-18 16:57
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0011_recipe_user_created_at_idx'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='IngredientTombstone',
+            fields=[
+                ('ingredient_id', models.PositiveIntegerField(primary_key=True, serialize=False)),
+                ('version', models.PositiveBigIntegerField(db_index=True)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='ingredient',
+            name='version',
+            field=models.PositiveBigIntegerField(db_index=True, default=0, editable=False),
+        ),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 4.2.7 on 2026-10-18 17:05
+
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0012_ingredient_versions'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PopularityWatermark',
+            fields=[
+                ('source', models.CharField(max_length=100, primary_key=True, serialize=False)),
+                ('last_id', models.PositiveBigIntegerField(default=0)),
+                ('refreshed_at', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='RecipePopularity',
+            fields=[
+                ('recipe', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='popularity', serialize=False, to='recipes.recipe')),
+                ('score', models.FloatField(db_index=True)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='userfavoriterecipe',
+            name='created_at',
+            field=models.DateTimeField(default=django.utils.timezone.now, editable=False),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.7 on 2026-10-18 17:39
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0013_recipe_popularity'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='popularitywatermark',
+            name='gaps',
+            field=models.JSONField(default=list),
+        ),
+    ]
@@ -1,6 +1,9 @@
 from django.contrib.auth import get_user_model
+from django.contrib.postgres.search import SearchVector, SearchVectorField
 from django.core.validators import RegexValidator
-from django.db import models
+from django.db import connections, models, transaction
+from django.db.models.functions import Greatest
+from django.utils import timezone
 from django.utils.translation import gettext_lazy as _
 
 from users.models import MyUser
@@ -10,6 +13,7 @@ from foodgram_backend.constants import (
     INGREDIENT_NAME_MAX_LENGTH,
     RECIPE_IMAGE_UPLOAD_TO,
     RECIPE_NAME_MAX_LENGTH,
+    RECIPE_SEARCH_CONFIG,
     TAG_COLOR_MAX_LENGTH,
     TAG_NAME_MAX_LENGTH
 )
@@ -39,11 +43,78 @@ class Ingredient(models.Model):
     measurement_unit = models.CharField(
         max_length=INGREDIENT_MEASUREMENT_UNIT_MAX_LENGTH
     )
+    version = models.PositiveBigIntegerField(
+        default=0, db_index=True, editable=False
+    )
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['name', 'measurement_unit'],
+                name='unique_ingredient_name_unit'
+            )
+        ]
 
     def __str__(self):
         return self.name
 
 
+class IngredientTombstone(models.Model):
+    """Record of a deleted ingredient for catalog delta sync."""
+
+    ingredient_id = models.PositiveIntegerField(primary_key=True)
+    version = models.PositiveBigIntegerField(db_index=True)
+
+    def __str__(self):
+        return f"ingredient {self.ingredient_id} deleted at v{self.version}"
+
+
+class RecipeQuerySet(models.QuerySet):
+
+    def with_viewer_flags(self, user):
+        """Annotate `is_favorited` and `is_in_shopping_cart` for `user`."""
+        if user is None or not user.is_authenticated:
+            return self.annotate(
+                is_favorited=models.Value(False),
+                is_in_shopping_cart=models.Value(False)
+            )
+        return self.annotate(
+            is_favorited=models.Exists(
+                UserFavoriteRecipe.objects.filter(
+                    user=user, recipe=models.OuterRef('pk')
+                )
+            ),
+            is_in_shopping_cart=models.Exists(
+                ShoppingCartItem.objects.filter(
+                    user=user, recipe=models.OuterRef('pk')
+                )
+            )
+        )
+
+    def update_search_vector(self):
+        """Recompute `search_vector`; a no-op outside PostgreSQL."""
+        if connections[self.db].vendor != 'postgresql':
+            return 0
+        return self.update(
+            search_vector=SearchVector(
+                'name', weight='A', config=RECIPE_SEARCH_CONFIG
+            ) + SearchVector(
+                'text', weight='B', config=RECIPE_SEARCH_CONFIG
+            )
+        )
+
+    def change_counter(self, field, delta):
+        """Atomically add `delta` to a counter column, never below zero."""
+        return self.update(**{field: Greatest(models.F(field) + delta, 0)})
+
+    def for_representation(self, user):
+        return self.with_viewer_flags(user).select_related(
+            'user'
+        ).prefetch_related(
+            'tags', 'recipe_ingredients'
+        ).defer('search_vector')
+
+
 class Recipe(models.Model):
     user = models.ForeignKey(
         get_user_model(), on_delete=models.CASCADE, null=True
@@ -57,21 +128,35 @@ class Recipe(models.Model):
     )
     name = models.CharField(max_length=RECIPE_NAME_MAX_LENGTH)
     image = models.ImageField(upload_to=RECIPE_IMAGE_UPLOAD_TO)
+    image_renditions = models.JSONField(default=dict, editable=False)
     text = models.TextField()
     cooking_time = models.PositiveIntegerField()
     created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    favorites_count = models.PositiveIntegerField(default=0, editable=False)
+    cart_count = models.PositiveIntegerField(default=0, editable=False)
+    search_vector = SearchVectorField(null=True, editable=False)
+
+    objects = RecipeQuerySet.as_manager()
 
     def is_in_user_shopping_cart(self, user):
         return self.shopping_cart_users.filter(pk=user.pk).exists()
 
-    def count_favorite_users(self):
-        return self.userfavoriterecipe_set.count()
-
     def __str__(self):
         return self.name
 
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            models.Index(
+                fields=['-created_at', '-id'],
+                name='recipe_created_at_id_idx'
+            ),
+            models.Index(
+                fields=['user', '-created_at', '-id'],
+                name='recipe_user_created_at_idx'
+            ),
+        ]
 
 
 class RecipeIngredient(models.Model):
@@ -85,6 +170,13 @@ class RecipeIngredient(models.Model):
     )
     amount = models.PositiveIntegerField()
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Stored row, so the shopping list signals can apply amount edits.
+        instance._loaded_values = dict(zip(field_names, values))
+        return instance
+
     def __str__(self):
         return f"{self.amount} {self.ingredient.name}"
 
@@ -94,6 +186,7 @@ class UserFavoriteRecipe(models.Model):
         MyUser, on_delete=models.CASCADE, related_name='favorite_recipes'
     )
     recipe = models.ForeignKey('Recipe', on_delete=models.CASCADE)
+    created_at = models.DateTimeField(default=timezone.now, editable=False)
 
     def __str__(self):
         return f"{self.user.username}'s favorite: {self.recipe.name}"
@@ -106,3 +199,143 @@ class ShoppingCartItem(models.Model):
 
     def __str__(self):
         return f"{self.user.username}'s shopping cart: {self.recipe.name}"
+
+
+class ShoppingListIngredient(models.Model):
+    """Per-user ingredient totals over all recipes in the shopping cart."""
+
+    user = models.ForeignKey(
+        MyUser, on_delete=models.CASCADE, related_name='shopping_list'
+    )
+    ingredient = models.ForeignKey(Ingredient, on_delete=models.CASCADE)
+    total_amount = models.IntegerField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'ingredient'],
+                name='unique_shopping_list_ingredient'
+            )
+        ]
+
+    def __str__(self):
+        return f"{self.user.username}: {self.total_amount} {self.ingredient}"
+
+
+class _PendingStampBumps(set):
+    """Stamp names bumped together after a commit."""
+
+    def __init__(self, model):
+        super().__init__()
+        self.model = model
+        self.done = False
+
+    def __call__(self):
+        self.done = True
+        for name in sorted(self):
+            self.model.bump(name)
+
+
+class ChangeStamp(models.Model):
+    """Version counter bumped whenever a group of tables changes."""
+
+    name = models.CharField(max_length=100, primary_key=True)
+    version = models.PositiveBigIntegerField(default=0)
+    changed_at = models.DateTimeField(default=timezone.now)
+
+    @classmethod
+    def bump(cls, name):
+        now = timezone.now()
+        updated = cls.objects.filter(name=name).update(
+            version=models.F('version') + 1, changed_at=now
+        )
+        if not updated:
+            cls.objects.get_or_create(
+                name=name, defaults={'version': 1, 'changed_at': now}
+            )
+
+    @classmethod
+    def bump_on_commit(cls, name, using=None):
+        """Bump the stamp once the current transaction commits.
+
+        The row is then locked only for its own short update instead of
+        for the rest of the writer's transaction, and a stamp requested
+        several times in one transaction is bumped once.
+        """
+        connection = transaction.get_connection(using)
+        # Only join bumps registered under the same savepoints, so they are
+        # discarded together when one of them is rolled back.
+        savepoints = set(filter(None, connection.savepoint_ids))
+        pending = next(
+            (
+                callback
+                for callback_savepoints, callback, *_
+                in connection.run_on_commit
+                if isinstance(callback, _PendingStampBumps)
+                and not callback.done
+                and set(filter(None, callback_savepoints)) == savepoints
+            ),
+            None
+        )
+        if pending is not None:
+            pending.add(name)
+            return
+        pending = _PendingStampBumps(cls)
+        pending.add(name)
+        # Outside a transaction this runs the bump straight away.
+        transaction.on_commit(pending, using=using)
+
+    @classmethod
+    def next_version(cls, name):
+        """Bump the stamp and return its new version.
+
+        Call inside the transaction that makes the change, so the stamp
+        row stays locked until the change is committed.
+        """
+        cls.bump(name)
+        return cls.objects.values_list('version', flat=True).get(name=name)
+
+    @classmethod
+    def get_version(cls, name):
+        return cls.objects.filter(name=name).values_list(
+            'version', flat=True
+        ).first() or 0
+
+    def __str__(self):
+        return f"{self.name} v{self.version}"
+
+
+class RecipePopularity(models.Model):
+    """Time-decayed favorite and cart activity of a recipe.
+
+    `score` is log2 of the sum of `weight * 2 ** (t / half-life)` over
+    the recipe's interactions, where t is the interaction time measured
+    from RECIPE_POPULARITY_EPOCH. Ordering by it equals ordering by the
+    decayed score at any moment, so stored rows never need rescaling.
+    """
+
+    recipe = models.OneToOneField(
+        Recipe, on_delete=models.CASCADE, primary_key=True,
+        related_name='popularity'
+    )
+    score = models.FloatField(db_index=True)
+
+    def __str__(self):
+        return f"{self.recipe_id}: {self.score:.3f}"
+
+
+class PopularityWatermark(models.Model):
+    """Interaction rows folded into recipe popularity, per source.
+
+    Every row up to `last_id` is folded except those whose ids are listed
+    in `gaps` as [id, time of the next row]: they were not committed when
+    the watermark passed them and are folded if they show up later.
+    """
+
+    source = models.CharField(max_length=100, primary_key=True)
+    last_id = models.PositiveBigIntegerField(default=0)
+    gaps = models.JSONField(default=list)
+    refreshed_at = models.DateTimeField(default=timezone.now)
+
+    def __str__(self):
+        return f"{self.source} #{self.last_id}"
@@ -1,7 +1,244 @@
-from rest_framework.pagination import PageNumberPagination
+import hashlib
+import json
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from functools import cached_property, partial
 
+from django.core.cache import cache
+from django.core.paginator import Paginator
+from django.db import connections
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
 
-class MyPagination(PageNumberPagination):
+from rest_framework.exceptions import NotFound, ParseError
+from rest_framework.pagination import (
+    BasePagination,
+    PageNumberPagination,
+    _positive_int
+)
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+from foodgram_backend.constants import (
+    PAGINATION_COUNT_CACHE_TIMEOUT,
+    PAGINATION_COUNT_ESTIMATE_THRESHOLD,
+    RECIPES_CHANGE_STAMP
+)
+
+from .conditional import get_change_stamps, viewer_stamp_name
+
+
+def estimate_count(queryset):
+    """Return the PostgreSQL planner row estimate for a queryset."""
+    connection = connections[queryset.db]
+    if connection.vendor != 'postgresql':
+        return None
+    sql, params = queryset.order_by().values('pk').query.sql_with_params()
+    with connection.cursor() as cursor:
+        cursor.execute(f'EXPLAIN (FORMAT JSON) {sql}', params)
+        plan = cursor.fetchone()[0]
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return int(plan[0]['Plan']['Plan Rows'])
+
+
+class CachedCountPaginator(Paginator):
+    """Paginator that reuses a cached count and estimates large ones.
+
+    Counts above the threshold come from the planner estimate instead of
+    a full COUNT(*), so the last pages of very large results are
+    approximate.
+    """
+
+    def __init__(self, *args, count_key, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.count_key = count_key
+
+    @cached_property
+    def count(self):
+        count = cache.get(self.count_key)
+        if count is None:
+            count = estimate_count(self.object_list)
+            if count is None or count < PAGINATION_COUNT_ESTIMATE_THRESHOLD:
+                count = self.object_list.count()
+            cache.set(self.count_key, count, PAGINATION_COUNT_CACHE_TIMEOUT)
+        return count
+
+
+class CachedCountPagination(PageNumberPagination):
+    """Page number pagination with counts cached per filtered query.
+
+    The cache key combines the query's SQL with change stamp versions, so
+    writes that bump the stamps invalidate cached counts. Counts seen by
+    a signed-in user also follow their favorites, cart and subscriptions.
+    """
+
+    count_change_stamps = (RECIPES_CHANGE_STAMP,)
+
+    def get_count_change_stamps(self, request):
+        if request.user.is_authenticated:
+            return (
+                *self.count_change_stamps, viewer_stamp_name(request.user.pk)
+            )
+        return self.count_change_stamps
+
+    def get_count_key(self, queryset, request):
+        sql, params = queryset.order_by().values('pk').query.sql_with_params()
+        parts = [queryset.db, sql, repr(params)]
+        parts.extend(
+            f'{stamp.name}:{stamp.version}'
+            for stamp in get_change_stamps(
+                request, self.get_count_change_stamps(request)
+            )
+        )
+        return 'pagination:count:' + hashlib.md5(
+            '|'.join(parts).encode()
+        ).hexdigest()
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.django_paginator_class = partial(
+            CachedCountPaginator,
+            count_key=self.get_count_key(queryset, request)
+        )
+        return super().paginate_queryset(queryset, request, view)
+
+
+class MyPagination(CachedCountPagination):
     page_size = 6
     page_size_query_param = 'limit'
     max_page_size = 1000
+
+
+class KeysetPagination(BasePagination):
+    """Forward-only pagination on `(created_at, id)`.
+
+    Each page is fetched with a range condition on the last seen row
+    instead of an OFFSET, so deep pages cost the same as the first one.
+    Querysets already ordered otherwise, e.g. by search rank, are
+    rejected, as their pages would not follow that order.
+    """
+
+    ordering = ('-created_at', '-id')
+    cursor_query_param = 'cursor'
+    page_size = 6
+    page_size_query_param = 'limit'
+    max_page_size = 1000
+    invalid_cursor_message = 'Invalid cursor'
+    invalid_ordering_message = (
+        'Cursor pagination only supports the default newest-first '
+        'ordering; use page numbers with search or ordering.'
+    )
+
+    def get_page_size(self, request):
+        try:
+            return _positive_int(
+                request.query_params[self.page_size_query_param],
+                strict=True,
+                cutoff=self.max_page_size
+            )
+        except (KeyError, ValueError):
+            return self.page_size
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            created_at, pk = urlsafe_b64decode(
+                encoded.encode()
+            ).decode().rsplit('|', 1)
+            position = parse_datetime(created_at), int(pk)
+        except (TypeError, ValueError):
+            raise NotFound(self.invalid_cursor_message)
+        if position[0] is None:
+            raise NotFound(self.invalid_cursor_message)
+        return position
+
+    def encode_cursor(self, instance):
+        if isinstance(instance, dict):
+            created_at, pk = instance['created_at'], instance['id']
+        else:
+            created_at, pk = instance.created_at, instance.pk
+        return urlsafe_b64encode(
+            f'{created_at.isoformat()}|{pk}'.encode()
+        ).decode()
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        page_size = self.get_page_size(request)
+        ordering = tuple(map(str, queryset.query.order_by))
+        if ordering != self.ordering[:len(ordering)]:
+            raise ParseError(self.invalid_ordering_message)
+        queryset = queryset.order_by(*self.ordering)
+        position = self.decode_cursor(request)
+        if position is not None:
+            created_at, pk = position
+            queryset = queryset.filter(
+                Q(created_at__lt=created_at)
+                | Q(created_at=created_at, id__lt=pk)
+            )
+        page = list(queryset[:page_size + 1])
+        self.next_cursor = (
+            self.encode_cursor(page[page_size - 1])
+            if len(page) > page_size else None
+        )
+        return page[:page_size]
+
+    def get_next_link(self):
+        if self.next_cursor is None:
+            return None
+        return replace_query_param(
+            self.request.build_absolute_uri(),
+            self.cursor_query_param,
+            self.next_cursor
+        )
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.get_next_link(),
+            'results': data,
+        })
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'properties': {
+                'next': {
+                    'type': 'string',
+                    'nullable': True,
+                    'format': 'uri',
+                },
+                'results': schema,
+            },
+        }
+
+
+class RecipePagination(CachedCountPagination):
+    """Page number pagination with keyset mode selected by `cursor`.
+
+    A batch fetch by `ids` returns all requested recipes on one page
+    unless `limit` is given.
+    """
+
+    page_size_query_param = 'limit'
+    max_page_size = 1000
+    keyset_pagination_class = KeysetPagination
+
+    def get_page_size(self, request):
+        ids = request.query_params.get('ids')
+        if ids and self.page_size_query_param not in request.query_params:
+            return min(len(ids.split(',')), self.max_page_size)
+        return super().get_page_size(request)
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.keyset = None
+        if self.keyset_pagination_class.cursor_query_param in (
+            request.query_params
+        ):
+            self.keyset = self.keyset_pagination_class()
+            return self.keyset.paginate_queryset(queryset, request, view)
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        if self.keyset is not None:
+            return self.keyset.get_paginated_response(data)
+        return super().get_paginated_response(data)
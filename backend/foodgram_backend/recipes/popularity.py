@@ -0,0 +1,46 @@
+import math
+
+from django.conf import settings
+
+from foodgram_backend.constants import RECIPE_POPULARITY_EPOCH
+
+from .models import ShoppingCartItem, UserFavoriteRecipe
+
+# Interaction tables folded into popularity: (source, model, time field,
+# weight setting).
+SOURCES = (
+    ('favorites', UserFavoriteRecipe, 'created_at', 'FAVORITE_WEIGHT'),
+    ('shopping_cart', ShoppingCartItem, 'added_at', 'CART_WEIGHT'),
+)
+
+
+def decay_exponent(moment):
+    """Half-lives elapsed between the epoch and `moment`."""
+    half_life = settings.RECIPE_POPULARITY['HALF_LIFE_HOURS'] * 60 * 60
+    return (moment - RECIPE_POPULARITY_EPOCH).total_seconds() / half_life
+
+
+def log_score(weight, moment):
+    """Stored score of a single interaction of `weight` at `moment`."""
+    return math.log2(weight) + decay_exponent(moment)
+
+
+def add_log_scores(first, second):
+    """log2(2 ** first + 2 ** second) without overflowing."""
+    if first is None:
+        return second
+    high, low = max(first, second), min(first, second)
+    return high + math.log2(1 + 2 ** (low - high))
+
+
+def current_score(score, now):
+    """Decayed score at `now` of a stored score."""
+    return 2 ** (score - decay_exponent(now))
+
+
+def score_floor(now):
+    """Stored scores below this have decayed under MIN_SCORE by `now`."""
+    return (
+        math.log2(settings.RECIPE_POPULARITY['MIN_SCORE'])
+        + decay_exponent(now)
+    )
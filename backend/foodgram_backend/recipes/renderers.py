@@ -0,0 +1,73 @@
+from rest_framework.renderers import BaseRenderer, JSONRenderer
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+class ShoppingCartRenderer(BaseRenderer):
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if isinstance(data, bytes):
+            return data
+        if isinstance(data, dict) and 'detail' in data:
+            data = data['detail']
+        return str(data).encode('utf-8')
+
+
+class PlainTextRenderer(ShoppingCartRenderer):
+    media_type = 'text/plain'
+    format = 'txt'
+
+
+class CSVRenderer(ShoppingCartRenderer):
+    media_type = 'text/csv'
+    format = 'csv'
+
+
+class PDFRenderer(ShoppingCartRenderer):
+    media_type = 'application/pdf'
+    format = 'pdf'
+    charset = None
+
+
+class FastJSONRenderer(JSONRenderer):
+    """JSONRenderer that encodes with orjson when it is installed.
+
+    The output is byte-for-byte what JSONRenderer produces for compact,
+    unicode, non-indented responses: datetimes and other non-native
+    values still go through DRF's encoder. Other settings, and data
+    orjson cannot encode, fall back to JSONRenderer.
+    """
+
+    options = (
+        orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME
+        if orjson else 0
+    )
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if (
+            orjson is None
+            or data is None
+            or not self.compact
+            or self.ensure_ascii
+            or self.get_indent(accepted_media_type, renderer_context or {})
+        ):
+            return super().render(
+                data, accepted_media_type, renderer_context
+            )
+        try:
+            content = orjson.dumps(
+                data, default=self.encoder_class().default,
+                option=self.options
+            )
+        except orjson.JSONEncodeError:
+            return super().render(
+                data, accepted_media_type, renderer_context
+            )
+        # Escaped by JSONRenderer for JavaScript compatibility.
+        return content.replace(
+            '\u2028'.encode(), b'\\u2028'
+        ).replace('\u2029'.encode(), b'\\u2029')
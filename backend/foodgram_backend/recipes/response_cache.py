@@ -0,0 +1,202 @@
+import hashlib
+import logging
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.locmem import LocMemCache
+
+from rest_framework.response import Response
+
+from foodgram_backend.constants import (
+    INGREDIENTS_CHANGE_STAMP,
+    POPULARITY_CHANGE_STAMP,
+    RECIPES_CHANGE_STAMP,
+    TAGS_CHANGE_STAMP
+)
+
+from .conditional import get_change_stamps, payload_recipes
+from .models import Recipe, ShoppingCartItem, UserFavoriteRecipe
+
+logger = logging.getLogger(__name__)
+
+VIEWER_FILTERS = ('is_favorited', 'is_in_shopping_cart')
+STATS_KEYS = ('hits', 'misses', 'hit_time_us', 'miss_time_us')
+
+
+def ordering_stamp_names(request):
+    """Stamps a recipe list depends on through its ordering."""
+    if request.GET.get('ordering') == 'popular':
+        return (POPULARITY_CHANGE_STAMP,)
+    return ()
+
+
+class RecipeResponseCache:
+    """Shared cache of recipe list/detail payloads.
+
+    Payloads are stored without viewer-specific flags, keyed by change
+    stamp versions and the normalized query, so any write that bumps a
+    stamp invalidates every entry. Flags for the current viewer and the
+    favorite and cart counters, which change without bumping a stamp,
+    are overlaid on each hit.
+    """
+
+    def __init__(self, stamp_names):
+        self.stamp_names = stamp_names
+
+    @property
+    def cache(self):
+        return caches[settings.RECIPE_RESPONSE_CACHE['ALIAS']]
+
+    @property
+    def shares_stats(self):
+        """Whether counters recorded here are visible to other processes."""
+        return not isinstance(self.cache, (LocMemCache, DummyCache))
+
+    def is_cacheable(self, request):
+        return not any(
+            request.query_params.get(name) for name in VIEWER_FILTERS
+        )
+
+    def get_stamp_names(self, request, action):
+        if action == 'popular':
+            return (*self.stamp_names, POPULARITY_CHANGE_STAMP)
+        return (*self.stamp_names, *ordering_stamp_names(request))
+
+    def make_key(self, request, action):
+        query = sorted(
+            (name, sorted(value for value in values if value))
+            for name, values in request.query_params.lists()
+        )
+        parts = [
+            action, request.get_host(), request.path, repr(query),
+            *(
+                f'{stamp.name}:{stamp.version}'
+                for stamp in get_change_stamps(
+                    request, self.get_stamp_names(request, action)
+                )
+            )
+        ]
+        return 'recipes:response:' + hashlib.md5(
+            '|'.join(parts).encode()
+        ).hexdigest()
+
+    def serve(self, request, action, render):
+        if not self.is_cacheable(request):
+            return render()
+        started = time.perf_counter()
+        key = self.make_key(request, action)
+        data = self.cache.get(key)
+        hit = data is not None
+        if hit:
+            response = Response(self.overlay(request, data))
+        else:
+            response = render()
+            if response.status_code == 200:
+                self.cache.set(
+                    key, self.neutralize(response.data),
+                    settings.RECIPE_RESPONSE_CACHE['TIMEOUT']
+                )
+        elapsed = time.perf_counter() - started
+        self.record(hit, elapsed)
+        response['X-Cache'] = 'HIT' if hit else 'MISS'
+        response['Server-Timing'] = (
+            f'recipes-cache;desc="{response["X-Cache"]}";'
+            f'dur={elapsed * 1000:.2f}'
+        )
+        return response
+
+    def neutralize(self, data):
+        if isinstance(data, list):
+            data = [dict(recipe) for recipe in data]
+        elif 'results' in data:
+            data = {
+                **data,
+                'results': [dict(recipe) for recipe in data['results']]
+            }
+        else:
+            data = dict(data)
+        for recipe in payload_recipes(data):
+            recipe['is_favorited'] = False
+            recipe['is_in_shopping_cart'] = False
+            if recipe['author'] is not None:
+                recipe['author'] = {
+                    **recipe['author'], 'is_subscribed': False
+                }
+        return data
+
+    def overlay(self, request, data):
+        recipes = payload_recipes(data)
+        recipe_ids = [recipe['id'] for recipe in recipes]
+        counters = {
+            pk: (favorites_count, cart_count)
+            for pk, favorites_count, cart_count in Recipe.objects.filter(
+                pk__in=recipe_ids
+            ).values_list('pk', 'favorites_count', 'cart_count')
+        }
+        for recipe in recipes:
+            if recipe['id'] in counters:
+                recipe['favorites_count'], recipe['cart_count'] = (
+                    counters[recipe['id']]
+                )
+        user = request.user
+        if not user.is_authenticated:
+            return data
+        from users.serializers import get_subscribed_ids
+
+        favorited = set(
+            UserFavoriteRecipe.objects.filter(
+                user=user, recipe_id__in=recipe_ids
+            ).values_list('recipe_id', flat=True)
+        )
+        in_cart = set(
+            ShoppingCartItem.objects.filter(
+                user=user, recipe_id__in=recipe_ids
+            ).values_list('recipe_id', flat=True)
+        )
+        subscribed = get_subscribed_ids({'request': request})
+        for recipe in recipes:
+            recipe['is_favorited'] = recipe['id'] in favorited
+            recipe['is_in_shopping_cart'] = recipe['id'] in in_cart
+            if recipe['author'] is not None:
+                recipe['author']['is_subscribed'] = (
+                    recipe['author']['id'] in subscribed
+                )
+        return data
+
+    def record(self, hit, elapsed):
+        logger.debug(
+            'Recipe response cache %s in %.2f ms',
+            'hit' if hit else 'miss', elapsed * 1000
+        )
+        if not self.shares_stats:
+            return
+        count_key, time_key = (
+            ('hits', 'hit_time_us') if hit else ('misses', 'miss_time_us')
+        )
+        for key, value in ((count_key, 1), (time_key, int(elapsed * 1e6))):
+            key = f'recipes:response:stats:{key}'
+            try:
+                self.cache.incr(key, value)
+            except ValueError:
+                self.cache.add(key, value, None)
+
+    def stats(self):
+        values = self.cache.get_many(
+            [f'recipes:response:stats:{key}' for key in STATS_KEYS]
+        )
+        return {
+            key: values.get(f'recipes:response:stats:{key}', 0)
+            for key in STATS_KEYS
+        }
+
+    def reset_stats(self):
+        self.cache.delete_many(
+            [f'recipes:response:stats:{key}' for key in STATS_KEYS]
+        )
+
+
+recipe_response_cache = RecipeResponseCache(
+    (RECIPES_CHANGE_STAMP, TAGS_CHANGE_STAMP, INGREDIENTS_CHANGE_STAMP)
+)
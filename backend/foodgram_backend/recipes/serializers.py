@@ -1,17 +1,23 @@
 import base64
+from operator import attrgetter
 
 from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
 from django.db import transaction
+from django.db.models import prefetch_related_objects
 
 from rest_framework import serializers
 from rest_framework.exceptions import ValidationError
-from users.serializers import MyUserSubscriptionSerializer
+from users.serializers import RecipeAuthorSerializer, get_subscribed_ids
 
 from foodgram_backend.constants import (
+    BULK_RECIPE_IDS_MAX,
     COOKING_TIME_MIN,
     RECIPE_INGREDIENT_AMOUNT_MIN
 )
 
+from .catalog import catalog
+from .images import enqueue_renditions, replace_renditions
 from .models import (
     Ingredient,
     Recipe,
@@ -19,6 +25,10 @@ from .models import (
     Tag,
     UserFavoriteRecipe
 )
+from .shopping_cart import (
+    defer_shopping_list_updates,
+    update_recipe_in_shopping_lists
+)
 
 
 class Base64ImageField(serializers.ImageField):
@@ -31,6 +41,28 @@ class Base64ImageField(serializers.ImageField):
         return super().to_internal_value(data)
 
 
+def media_url(path, request):
+    url = default_storage.url(path)
+    return request.build_absolute_uri(url) if request else url
+
+
+def rendition_urls(renditions, request):
+    return {
+        name: {
+            extension: media_url(path, request)
+            for extension, path in formats.items()
+        }
+        for name, formats in renditions.items()
+    }
+
+
+class ImageRenditionsField(serializers.ReadOnlyField):
+    """Absolute URLs of resized copies of the recipe image by size/format."""
+
+    def to_representation(self, renditions):
+        return rendition_urls(renditions, self.context.get('request'))
+
+
 class TagSerializer(serializers.ModelSerializer):
     class Meta:
         model = Tag
@@ -45,10 +77,11 @@ class IngredientSerializer(serializers.ModelSerializer):
 
 
 class FavoriteSerializer(serializers.ModelSerializer):
+    image_renditions = ImageRenditionsField()
 
     class Meta:
         model = Recipe
-        fields = ('id', 'name', 'image', 'cooking_time')
+        fields = ('id', 'name', 'image', 'image_renditions', 'cooking_time')
 
 
 class ShoppingCartSerializer(serializers.ModelSerializer):
@@ -64,6 +97,17 @@ class ShoppingCartSerializer(serializers.ModelSerializer):
         return recipe.is_in_user_shopping_cart(user)
 
 
+class RecipeIdsSerializer(serializers.Serializer):
+    ids = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        allow_empty=False,
+        max_length=BULK_RECIPE_IDS_MAX
+    )
+
+    def validate_ids(self, ids):
+        return list(dict.fromkeys(ids))
+
+
 class RecipeIngredientSerializer(serializers.ModelSerializer):
     id = serializers.IntegerField(source='ingredient.id')
     name = serializers.CharField(source='ingredient.name', required=False)
@@ -78,6 +122,19 @@ class RecipeIngredientSerializer(serializers.ModelSerializer):
             'measurement_unit', 'amount'
         ]
 
+    def to_representation(self, instance):
+        # Ingredient details come from the catalog to avoid a join.
+        ingredient = (
+            catalog.ingredients().get(instance.ingredient_id)
+            or instance.ingredient
+        )
+        return {
+            'id': ingredient.pk,
+            'name': ingredient.name,
+            'measurement_unit': ingredient.measurement_unit,
+            'amount': instance.amount,
+        }
+
 
 class RecipeSerializer(serializers.ModelSerializer):
     ingredients = RecipeIngredientSerializer(
@@ -87,7 +144,8 @@ class RecipeSerializer(serializers.ModelSerializer):
         child=serializers.IntegerField(), write_only=True
     )
     image = Base64ImageField()
-    author = MyUserSubscriptionSerializer(source='user', read_only=True)
+    image_renditions = ImageRenditionsField()
+    author = RecipeAuthorSerializer(source='user', read_only=True)
     is_favorited = serializers.SerializerMethodField()
     is_in_shopping_cart = serializers.SerializerMethodField()
 
@@ -95,16 +153,23 @@ class RecipeSerializer(serializers.ModelSerializer):
         model = Recipe
         fields = [
             'id', 'tags', 'author', 'ingredients', 'is_favorited',
-            'is_in_shopping_cart', 'name', 'image', 'text', 'cooking_time'
+            'is_in_shopping_cart', 'name', 'image', 'image_renditions',
+            'text', 'cooking_time', 'favorites_count', 'cart_count'
         ]
 
     def get_is_in_shopping_cart(self, obj):
+        annotated = getattr(obj, 'is_in_shopping_cart', None)
+        if annotated is not None:
+            return annotated
         request = self.context.get('request')
         if request and request.user.is_authenticated:
             return obj.is_in_user_shopping_cart(request.user)
         return False
 
     def get_is_favorited(self, obj):
+        annotated = getattr(obj, 'is_favorited', None)
+        if annotated is not None:
+            return annotated
         request = self.context.get('request')
         if request and request.user.is_authenticated:
             return UserFavoriteRecipe.objects.filter(
@@ -123,6 +188,7 @@ class RecipeSerializer(serializers.ModelSerializer):
         tags_data = validated_data.pop('tags', [])
 
         recipe = Recipe.objects.create(**validated_data)
+        enqueue_renditions(recipe.pk)
 
         recipe.tags.set(tags_data)
 
@@ -131,48 +197,95 @@ class RecipeSerializer(serializers.ModelSerializer):
         return recipe
 
     def to_representation(self, instance):
+        # No-op for prefetched list items; avoids N+1 after create/update.
+        prefetch_related_objects([instance], 'tags', 'recipe_ingredients')
         representation = super().to_representation(instance)
-        tags_representation = TagSerializer(
-            instance.tags.all(), many=True
-        ).data
-
-        representation['tags'] = tags_representation
+        tag_data = catalog.tag_data()
+        representation['tags'] = [
+            tag_data.get(tag.pk) or TagSerializer(tag).data
+            for tag in sorted(instance.tags.all(), key=attrgetter('pk'))
+        ]
 
         return representation
 
     @transaction.atomic
     def update(self, instance, validated_data):
         instance.name = validated_data.get('name', instance.name)
-        instance.image = validated_data.get('image', instance.image)
+        if 'image' in validated_data:
+            instance.image = validated_data['image']
+            replace_renditions(instance)
         instance.text = validated_data.get('text', instance.text)
         instance.cooking_time = validated_data.get(
             'cooking_time', instance.cooking_time
         )
 
-        tags_data = validated_data.get('tags', [])
-        instance.tags.set(tags_data)
-
-        ingredients_data = validated_data.get('recipe_ingredients', [])
-        RecipeIngredient.objects.filter(recipe=instance).delete()
+        if 'tags' in validated_data and set(validated_data['tags']) != {
+            tag.pk for tag in instance.tags.all()
+        }:
+            instance.tags.set(validated_data['tags'])
 
-        self._create_or_update_recipe_ingredients(instance, ingredients_data)
+        if 'recipe_ingredients' in validated_data:
+            self._update_recipe_ingredients(
+                instance, validated_data['recipe_ingredients']
+            )
 
         instance.save()
         return instance
 
     def _create_or_update_recipe_ingredients(self, recipe, ingredients_data):
-        recipe_ingredients = []
-        for ingredient_data in ingredients_data:
-            ingredient_id = ingredient_data['ingredient']['id']
-            amount = ingredient_data['amount']
-            ingredient = Ingredient.objects.get(pk=ingredient_id)
-
-            recipe_ingredient = RecipeIngredient(
-                recipe=recipe, ingredient=ingredient, amount=amount
+        RecipeIngredient.objects.bulk_create([
+            RecipeIngredient(
+                recipe=recipe,
+                ingredient_id=ingredient_data['ingredient']['id'],
+                amount=ingredient_data['amount']
             )
-            recipe_ingredients.append(recipe_ingredient)
-
-        RecipeIngredient.objects.bulk_create(recipe_ingredients)
+            for ingredient_data in ingredients_data
+        ])
+
+    def _update_recipe_ingredients(self, recipe, ingredients_data):
+        """Insert, update or delete only the rows that changed.
+
+        Deleted rows are taken off shopping lists by their pre_delete
+        receiver. bulk_create and bulk_update send no signals, so their
+        deltas are applied here, merged with the deletes into one update.
+        """
+        existing = {
+            recipe_ingredient.ingredient_id: recipe_ingredient
+            for recipe_ingredient in recipe.recipe_ingredients.all()
+        }
+        new_amounts = {
+            ingredient_data['ingredient']['id']: ingredient_data['amount']
+            for ingredient_data in ingredients_data
+        }
+
+        deltas = {}
+        changed = []
+        for ingredient_id, amount in new_amounts.items():
+            recipe_ingredient = existing.get(ingredient_id)
+            if recipe_ingredient is None:
+                deltas[ingredient_id] = amount
+            elif recipe_ingredient.amount != amount:
+                deltas[ingredient_id] = amount - recipe_ingredient.amount
+                recipe_ingredient.amount = amount
+                changed.append(recipe_ingredient)
+
+        with defer_shopping_list_updates():
+            removed = existing.keys() - new_amounts.keys()
+            if removed:
+                RecipeIngredient.objects.filter(
+                    recipe=recipe, ingredient_id__in=removed
+                ).delete()
+            if changed:
+                RecipeIngredient.objects.bulk_update(changed, ['amount'])
+            RecipeIngredient.objects.bulk_create([
+                RecipeIngredient(
+                    recipe=recipe, ingredient_id=ingredient_id, amount=amount
+                )
+                for ingredient_id, amount in new_amounts.items()
+                if ingredient_id not in existing
+            ])
+            if deltas:
+                update_recipe_in_shopping_lists(recipe.pk, deltas)
 
     def validate_ingredient(self, ingredient_data):
         ingredient_id = ingredient_data['ingredient']['id']
@@ -185,19 +298,17 @@ class RecipeSerializer(serializers.ModelSerializer):
             )
 
     def validate_tags(self, tags_data):
-        unique_tags = set()
+        if len(set(tags_data)) != len(tags_data):
+            raise serializers.ValidationError(
+                {'detail': 'Duplicate tags are not allowed.'},
+                code='invalid'
+            )
 
+        # Tags created by another worker may not be in the catalog yet.
+        missing = set(tags_data) - catalog.tags().keys()
+        found = Tag.objects.in_bulk(missing) if missing else {}
         for tag_id in tags_data:
-            if tag_id in unique_tags:
-                raise serializers.ValidationError(
-                    {'detail': 'Duplicate tags are not allowed.'},
-                    code='invalid'
-                )
-            unique_tags.add(tag_id)
-
-            try:
-                Tag.objects.get(pk=tag_id)
-            except Tag.DoesNotExist:
+            if tag_id in missing and tag_id not in found:
                 raise serializers.ValidationError(
                     {'detail': f'Tag with id {tag_id} does not exist.'},
                     code='invalid'
@@ -229,25 +340,130 @@ class RecipeSerializer(serializers.ModelSerializer):
                 )
             unique_ingredients.add(ingredient_id)
 
-            try:
-                Ingredient.objects.get(pk=ingredient_id)
-            except Ingredient.DoesNotExist:
-                raise serializers.ValidationError(
-                    {'detail': 'Ingredient with id does not exist.'},
-                    code='invalid'
-                )
+        missing = unique_ingredients - catalog.ingredients().keys()
+        if missing and Ingredient.objects.filter(
+            pk__in=missing
+        ).count() != len(missing):
+            raise serializers.ValidationError(
+                {'detail': 'Ingredient with id does not exist.'},
+                code='invalid'
+            )
 
         return ingredients_data
 
     def validate(self, data):
-        ingredients_data = data.get('recipe_ingredients', [])
-        tags_data = data.get('tags', [])
-        cooking_time = data.get('cooking_time')
-
-        for ingredient_data in ingredients_data:
+        # Tags and cooking time are checked by their field-level validators.
+        for ingredient_data in data.get('recipe_ingredients', []):
             self.validate_ingredient(ingredient_data)
 
-        self.validate_tags(tags_data)
-        self.validate_cooking_time(cooking_time)
-
         return data
+
+
+class RecipeRowListSerializer(serializers.ListSerializer):
+
+    def to_representation(self, data):
+        return self.child.represent(list(data))
+
+
+class RecipeRowSerializer(serializers.BaseSerializer):
+    """Read-only recipe representation built from `values()` rows.
+
+    Produces the same output as RecipeSerializer without instantiating
+    models or running field-by-field serialization: tags and ingredient
+    amounts are fetched for the whole page in one query each and
+    resolved through the catalog. Used for recipe lists.
+    """
+
+    row_fields = (
+        'id', 'created_at', 'name', 'image', 'image_renditions', 'text',
+        'cooking_time', 'favorites_count', 'cart_count', 'is_favorited',
+        'is_in_shopping_cart', 'user_id', 'user__email', 'user__username',
+        'user__first_name', 'user__last_name'
+    )
+
+    class Meta:
+        list_serializer_class = RecipeRowListSerializer
+
+    def to_representation(self, row):
+        return self.represent([row])[0]
+
+    def represent(self, rows):
+        recipe_ids = [row['id'] for row in rows]
+        tags = self._get_tags(recipe_ids)
+        ingredients = self._get_ingredients(recipe_ids)
+        request = self.context.get('request')
+        subscribed_ids = get_subscribed_ids(self.context)
+        return [
+            {
+                'id': row['id'],
+                'author': self._get_author(row, subscribed_ids),
+                'ingredients': ingredients.get(row['id'], []),
+                'is_favorited': row['is_favorited'],
+                'is_in_shopping_cart': row['is_in_shopping_cart'],
+                'name': row['name'],
+                'image': (
+                    media_url(row['image'], request) if row['image'] else None
+                ),
+                'image_renditions': rendition_urls(
+                    row['image_renditions'], request
+                ),
+                'text': row['text'],
+                'cooking_time': row['cooking_time'],
+                'favorites_count': row['favorites_count'],
+                'cart_count': row['cart_count'],
+                'tags': tags.get(row['id'], []),
+            }
+            for row in rows
+        ]
+
+    def _get_author(self, row, subscribed_ids):
+        if row['user_id'] is None:
+            return None
+        return {
+            'email': row['user__email'],
+            'id': row['user_id'],
+            'username': row['user__username'],
+            'first_name': row['user__first_name'],
+            'last_name': row['user__last_name'],
+            'is_subscribed': row['user_id'] in subscribed_ids,
+        }
+
+    def _get_tags(self, recipe_ids):
+        pairs = list(Recipe.tags.through.objects.filter(
+            recipe_id__in=recipe_ids
+        ).order_by('tag_id').values_list('recipe_id', 'tag_id'))
+        tag_data = catalog.tag_data()
+        missing = {tag_id for _, tag_id in pairs} - tag_data.keys()
+        if missing:
+            tag_data = {
+                **tag_data,
+                **{
+                    tag.pk: TagSerializer(tag).data
+                    for tag in Tag.objects.filter(pk__in=missing)
+                },
+            }
+        tags = {}
+        for recipe_id, tag_id in pairs:
+            tags.setdefault(recipe_id, []).append(tag_data[tag_id])
+        return tags
+
+    def _get_ingredients(self, recipe_ids):
+        rows = list(RecipeIngredient.objects.filter(
+            recipe_id__in=recipe_ids
+        ).order_by('pk').values_list('recipe_id', 'ingredient_id', 'amount'))
+        by_id = catalog.ingredients()
+        missing = {ingredient_id for _, ingredient_id, _ in rows} - (
+            by_id.keys()
+        )
+        if missing:
+            by_id = {**by_id, **Ingredient.objects.in_bulk(missing)}
+        ingredients = {}
+        for recipe_id, ingredient_id, amount in rows:
+            ingredient = by_id[ingredient_id]
+            ingredients.setdefault(recipe_id, []).append({
+                'id': ingredient.pk,
+                'name': ingredient.name,
+                'measurement_unit': ingredient.measurement_unit,
+                'amount': amount,
+            })
+        return ingredients
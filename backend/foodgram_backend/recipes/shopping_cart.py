@@ -0,0 +1,321 @@
+import csv
+import hashlib
+import io
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Case, F, IntegerField, Sum, Value, When
+
+from reportlab.lib.pagesizes import A4
+from reportlab.pdfbase import pdfmetrics
+from reportlab.pdfbase.ttfonts import TTFont
+from reportlab.pdfgen import canvas
+from users.models import MyUser
+
+from foodgram_backend.constants import (
+    SHOPPING_CART_EXPORT_CACHE_TIMEOUT,
+    SHOPPING_CART_EXPORT_CHUNK_SIZE
+)
+
+from .models import RecipeIngredient, ShoppingCartItem, ShoppingListIngredient
+
+PDF_FONT_NAME = 'ShoppingCartFont'
+PDF_FONT_SIZE = 12
+PDF_MARGIN = 50
+PDF_LINE_HEIGHT = 18
+
+# _PendingUpdates collected inside defer_shopping_list_updates(); None
+# applies changes straight away.
+_pending_updates = ContextVar('pending_shopping_list_updates', default=None)
+
+
+class _PendingUpdates:
+    def __init__(self):
+        # {user_id: {recipe_id: 1 when added, -1 when removed}}
+        self.cart_changes = {}
+        # {recipe_id: {ingredient_id: delta}}
+        self.recipe_deltas = {}
+
+
+def get_cart_version(user):
+    """Return a stamp that changes whenever the user's cart output would.
+
+    The export is rendered from the user's shopping list totals and the
+    names of their ingredients, so the stamp digests the totals and the
+    ingredient versions, which every ingredient save bumps.
+    """
+    rows = ShoppingListIngredient.objects.filter(user=user).order_by(
+        'ingredient_id'
+    ).values_list('ingredient_id', 'total_amount', 'ingredient__version')
+    return hashlib.md5(
+        '|'.join(':'.join(map(str, row)) for row in rows).encode()
+    ).hexdigest()
+
+
+def get_cart_rows(user):
+    return ShoppingListIngredient.objects.filter(user=user).values(
+        ingredient_name=F('ingredient__name'),
+        measurement_unit=F('ingredient__measurement_unit'),
+        total_quantity=F('total_amount')
+    ).order_by('ingredient_name', 'measurement_unit')
+
+
+@transaction.atomic(savepoint=False)
+def apply_shopping_list_deltas(user_ids, deltas):
+    """Add `deltas` ({ingredient_id: amount}) to each user's totals.
+
+    User rows are locked first so concurrent cart changes of the same
+    user are applied one after another. Callers run inside the write that
+    causes the change, so no savepoint of its own is needed.
+    """
+    user_ids = list(user_ids)
+    deltas = {
+        ingredient_id: delta
+        for ingredient_id, delta in deltas.items() if delta
+    }
+    if not user_ids or not deltas:
+        return
+    list(
+        MyUser.objects.select_for_update().filter(
+            pk__in=user_ids
+        ).values_list('pk', flat=True)
+    )
+    items = ShoppingListIngredient.objects.filter(
+        user_id__in=user_ids, ingredient_id__in=list(deltas)
+    )
+    existing = set(items.values_list('user_id', 'ingredient_id'))
+
+    if existing:
+        items.update(total_amount=F('total_amount') + Case(
+            *(
+                When(ingredient_id=ingredient_id, then=Value(delta))
+                for ingredient_id, delta in deltas.items()
+            ),
+            output_field=IntegerField()
+        ))
+    ShoppingListIngredient.objects.bulk_create([
+        ShoppingListIngredient(
+            user_id=user_id, ingredient_id=ingredient_id, total_amount=delta
+        )
+        for user_id in user_ids
+        for ingredient_id, delta in deltas.items()
+        if delta > 0 and (user_id, ingredient_id) not in existing
+    ])
+    if any(delta < 0 for delta in deltas.values()):
+        items.filter(total_amount__lte=0).delete()
+
+
+def get_recipes_amounts(recipe_ids):
+    """Sum ingredient amounts over several recipes."""
+    return dict(
+        RecipeIngredient.objects.filter(
+            recipe_id__in=recipe_ids
+        ).values('ingredient_id').annotate(
+            total=Sum('amount')
+        ).values_list('ingredient_id', 'total')
+    )
+
+
+def change_shopping_list_recipes(user_id, changes):
+    """Add or remove recipes of a user's shopping list.
+
+    `changes` maps recipe ids to 1 for added and -1 for removed recipes.
+    Inside defer_shopping_list_updates() the changes of each user are
+    merged and applied when the block exits.
+    """
+    pending = _pending_updates.get()
+    if pending is not None:
+        user_changes = pending.cart_changes.setdefault(user_id, {})
+        for recipe_id, change in changes.items():
+            user_changes[recipe_id] = user_changes.get(recipe_id, 0) + change
+        return
+    deltas = {}
+    for sign in (1, -1):
+        recipe_ids = [
+            recipe_id for recipe_id, change in changes.items()
+            if change * sign > 0
+        ]
+        if not recipe_ids:
+            continue
+        for ingredient_id, amount in get_recipes_amounts(recipe_ids).items():
+            deltas[ingredient_id] = deltas.get(ingredient_id, 0) + (
+                sign * amount
+            )
+    apply_shopping_list_deltas([user_id], deltas)
+
+
+def add_recipe_to_shopping_list(user_id, recipe_id):
+    change_shopping_list_recipes(user_id, {recipe_id: 1})
+
+
+def remove_recipe_from_shopping_list(user_id, recipe_id):
+    change_shopping_list_recipes(user_id, {recipe_id: -1})
+
+
+def add_recipes_to_shopping_list(user_id, recipe_ids):
+    change_shopping_list_recipes(user_id, dict.fromkeys(recipe_ids, 1))
+
+
+def remove_recipes_from_shopping_list(user_id, recipe_ids):
+    change_shopping_list_recipes(user_id, dict.fromkeys(recipe_ids, -1))
+
+
+def update_recipe_in_shopping_lists(recipe_id, deltas):
+    """Apply an edit of a recipe's ingredients to every cart holding it.
+
+    `deltas` maps ingredient ids to the change of their amount. Inside
+    defer_shopping_list_updates() the edit is merged with the others of
+    the same recipe and applied when the block exits.
+    """
+    pending = _pending_updates.get()
+    if pending is not None:
+        recipe_deltas = pending.recipe_deltas.setdefault(recipe_id, {})
+        for ingredient_id, delta in deltas.items():
+            recipe_deltas[ingredient_id] = (
+                recipe_deltas.get(ingredient_id, 0) + delta
+            )
+        return
+    if not any(deltas.values()):
+        return
+    apply_shopping_list_deltas(
+        ShoppingCartItem.objects.filter(
+            recipe_id=recipe_id
+        ).values_list('user_id', flat=True),
+        deltas
+    )
+
+
+@contextmanager
+def defer_shopping_list_updates():
+    """Apply the shopping list changes made in the block in one go.
+
+    Cart changes are applied once per user and ingredient edits once per
+    recipe. Removed recipes are looked up when the block exits, so it
+    must not delete their ingredients.
+    """
+    if _pending_updates.get() is not None:
+        yield
+        return
+    pending = _PendingUpdates()
+    token = _pending_updates.set(pending)
+    try:
+        yield
+    finally:
+        _pending_updates.reset(token)
+    for user_id, changes in pending.cart_changes.items():
+        change_shopping_list_recipes(user_id, changes)
+    for recipe_id, deltas in pending.recipe_deltas.items():
+        update_recipe_in_shopping_lists(recipe_id, deltas)
+
+
+def get_expected_shopping_lists(user_ids):
+    """Compute shopping list totals from the cart for `user_ids`."""
+    return {
+        (row['user_id'], row['ingredient_id']): row['total']
+        for row in ShoppingCartItem.objects.filter(
+            user_id__in=user_ids
+        ).exclude(
+            recipe__recipe_ingredients=None
+        ).values(
+            'user_id',
+            ingredient_id=F('recipe__recipe_ingredients__ingredient_id')
+        ).annotate(
+            total=Sum('recipe__recipe_ingredients__amount')
+        )
+    }
+
+
+def render_txt(rows):
+    for index, data in enumerate(rows):
+        line = (
+            f"{data['ingredient_name']} ---"
+            + f" {data['total_quantity']} ({data['measurement_unit']})"
+        )
+        yield (line if index == 0 else '\n' + line).encode()
+
+
+class _Echo:
+    def write(self, value):
+        return value
+
+
+def render_csv(rows):
+    writer = csv.writer(_Echo())
+    yield writer.writerow(['ingredient', 'amount', 'unit']).encode()
+    for data in rows:
+        yield writer.writerow([
+            data['ingredient_name'],
+            data['total_quantity'],
+            data['measurement_unit']
+        ]).encode()
+
+
+def _register_pdf_font():
+    if PDF_FONT_NAME in pdfmetrics.getRegisteredFontNames():
+        return PDF_FONT_NAME
+    try:
+        pdfmetrics.registerFont(
+            TTFont(PDF_FONT_NAME, settings.SHOPPING_CART_PDF_FONT)
+        )
+    except Exception:
+        return 'Helvetica'
+    return PDF_FONT_NAME
+
+
+def render_pdf(rows):
+    buffer = io.BytesIO()
+    font_name = _register_pdf_font()
+    pdf = canvas.Canvas(buffer, pagesize=A4)
+    width, height = A4
+    y = height - PDF_MARGIN
+    pdf.setFont(font_name, PDF_FONT_SIZE)
+    for data in rows:
+        if y < PDF_MARGIN:
+            pdf.showPage()
+            pdf.setFont(font_name, PDF_FONT_SIZE)
+            y = height - PDF_MARGIN
+        pdf.drawString(
+            PDF_MARGIN, y,
+            f"{data['ingredient_name']} ---"
+            + f" {data['total_quantity']} ({data['measurement_unit']})"
+        )
+        y -= PDF_LINE_HEIGHT
+    pdf.save()
+    content = buffer.getvalue()
+    for start in range(0, len(content), SHOPPING_CART_EXPORT_CHUNK_SIZE):
+        yield content[start:start + SHOPPING_CART_EXPORT_CHUNK_SIZE]
+
+
+EXPORT_RENDERERS = {
+    'txt': render_txt,
+    'csv': render_csv,
+    'pdf': render_pdf,
+}
+
+
+def _cache_chunks(key, chunks):
+    parts = []
+    for chunk in chunks:
+        parts.append(chunk)
+        yield chunk
+    cache.set(key, b''.join(parts), SHOPPING_CART_EXPORT_CACHE_TIMEOUT)
+
+
+def export_shopping_cart(user, export_format):
+    """Return an iterator over the encoded shopping list.
+
+    Output is cached per user and format under the current cart version,
+    so repeated downloads of an unchanged cart skip the aggregation.
+    """
+    key = 'shopping_cart:{}:{}:{}'.format(
+        user.pk, export_format, get_cart_version(user)
+    )
+    content = cache.get(key)
+    if content is not None:
+        return iter([content])
+    return _cache_chunks(
+        key, EXPORT_RENDERERS[export_format](get_cart_rows(user).iterator())
+    )
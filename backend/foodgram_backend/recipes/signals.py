@@ -0,0 +1,184 @@
+from django.db import transaction
+from django.db.models import DEFERRED, QuerySet
+from django.db.models.signals import (
+    m2m_changed,
+    post_delete,
+    post_save,
+    pre_delete,
+    pre_save
+)
+from django.dispatch import receiver
+
+from users.models import MyUser, UserSubscription
+
+from foodgram_backend.constants import (
+    INGREDIENTS_CHANGE_STAMP,
+    RECIPES_CHANGE_STAMP,
+    TAGS_CHANGE_STAMP
+)
+
+from .catalog import catalog
+from .conditional import viewer_stamp_name
+from .models import (
+    ChangeStamp,
+    Ingredient,
+    IngredientTombstone,
+    Recipe,
+    RecipeIngredient,
+    ShoppingCartItem,
+    Tag,
+    UserFavoriteRecipe
+)
+from .shopping_cart import (
+    add_recipe_to_shopping_list,
+    remove_recipe_from_shopping_list,
+    update_recipe_in_shopping_lists
+)
+
+RECIPE_INGREDIENT_ROW = ('recipe_id', 'ingredient_id', 'amount')
+# User fields shown as the author of a recipe.
+RECIPE_AUTHOR_FIELDS = ('email', 'username', 'first_name', 'last_name')
+
+
+@receiver(post_save, sender=Ingredient)
+def version_saved_ingredient(sender, instance, using, **kwargs):
+    with transaction.atomic(using=using):
+        instance.version = ChangeStamp.next_version(INGREDIENTS_CHANGE_STAMP)
+        Ingredient.objects.using(using).filter(pk=instance.pk).update(
+            version=instance.version
+        )
+    transaction.on_commit(
+        lambda: catalog.invalidate(INGREDIENTS_CHANGE_STAMP), using=using
+    )
+
+
+@receiver(post_delete, sender=Ingredient)
+def record_deleted_ingredient(sender, instance, using, **kwargs):
+    with transaction.atomic(using=using):
+        IngredientTombstone.objects.using(using).update_or_create(
+            ingredient_id=instance.pk,
+            defaults={
+                'version': ChangeStamp.next_version(INGREDIENTS_CHANGE_STAMP)
+            }
+        )
+    transaction.on_commit(
+        lambda: catalog.invalidate(INGREDIENTS_CHANGE_STAMP), using=using
+    )
+
+
+@receiver([post_save, post_delete], sender=Tag)
+def bump_tags_stamp(sender, **kwargs):
+    ChangeStamp.bump_on_commit(TAGS_CHANGE_STAMP)
+    transaction.on_commit(lambda: catalog.invalidate(TAGS_CHANGE_STAMP))
+
+
+@receiver([post_save, post_delete], sender=Recipe)
+@receiver([post_save, post_delete], sender=RecipeIngredient)
+def bump_recipes_stamp(sender, **kwargs):
+    ChangeStamp.bump_on_commit(RECIPES_CHANGE_STAMP)
+
+
+@receiver(m2m_changed, sender=Recipe.tags.through)
+def bump_recipes_stamp_on_tags_change(sender, action, **kwargs):
+    if action in ('post_add', 'post_remove', 'post_clear'):
+        bump_recipes_stamp(sender)
+
+
+@receiver(pre_save, sender=MyUser)
+def remember_author_change(sender, instance, using, update_fields=None,
+                           **kwargs):
+    # New users have no recipes yet; deleting a user deletes their
+    # recipes, which bumps the stamp on its own.
+    instance._author_changed = False
+    if instance._state.adding or (
+        update_fields is not None
+        and not set(update_fields) & set(RECIPE_AUTHOR_FIELDS)
+    ):
+        return
+    stored = MyUser.objects.using(using).filter(pk=instance.pk).values_list(
+        *RECIPE_AUTHOR_FIELDS
+    ).first()
+    instance._author_changed = stored != tuple(
+        getattr(instance, field) for field in RECIPE_AUTHOR_FIELDS
+    )
+
+
+@receiver(post_save, sender=MyUser)
+def bump_recipes_stamp_on_author_change(sender, instance, **kwargs):
+    if instance.__dict__.pop('_author_changed', False):
+        ChangeStamp.bump_on_commit(RECIPES_CHANGE_STAMP)
+
+
+# Favorites, cart items and subscriptions only change what their own user
+# sees, so they bump that user's stamp instead of the shared one.
+@receiver([post_save, post_delete], sender=UserFavoriteRecipe)
+@receiver([post_save, post_delete], sender=ShoppingCartItem)
+def bump_viewer_stamp(sender, instance, **kwargs):
+    ChangeStamp.bump_on_commit(viewer_stamp_name(instance.user_id))
+
+
+@receiver([post_save, post_delete], sender=UserSubscription)
+def bump_subscriber_stamp(sender, instance, **kwargs):
+    ChangeStamp.bump_on_commit(viewer_stamp_name(instance.from_user_id))
+
+
+@receiver(post_save, sender=Recipe)
+def update_recipe_search_vector(sender, instance, using, **kwargs):
+    Recipe.objects.using(using).filter(
+        pk=instance.pk
+    ).update_search_vector()
+
+
+@receiver(post_save, sender=ShoppingCartItem)
+def add_cart_item_to_shopping_list(sender, instance, created, **kwargs):
+    if created:
+        add_recipe_to_shopping_list(instance.user_id, instance.recipe_id)
+
+
+@receiver(pre_delete, sender=ShoppingCartItem)
+def remove_cart_item_from_shopping_list(sender, instance, **kwargs):
+    remove_recipe_from_shopping_list(instance.user_id, instance.recipe_id)
+
+
+@receiver(pre_save, sender=RecipeIngredient)
+def remember_stored_recipe_ingredient(sender, instance, using, **kwargs):
+    stored = getattr(instance, '_loaded_values', {})
+    if any(stored.get(field, DEFERRED) is DEFERRED
+           for field in RECIPE_INGREDIENT_ROW):
+        stored = None
+        if instance.pk is not None:
+            stored = RecipeIngredient.objects.using(using).filter(
+                pk=instance.pk
+            ).values(*RECIPE_INGREDIENT_ROW).first()
+    instance._stored_row = stored
+
+
+@receiver(post_save, sender=RecipeIngredient)
+def update_shopping_lists_on_ingredient_save(sender, instance, **kwargs):
+    stored = instance.__dict__.pop('_stored_row', None)
+    deltas = {instance.recipe_id: {instance.ingredient_id: instance.amount}}
+    if stored:
+        recipe_deltas = deltas.setdefault(stored['recipe_id'], {})
+        recipe_deltas[stored['ingredient_id']] = (
+            recipe_deltas.get(stored['ingredient_id'], 0) - stored['amount']
+        )
+    for recipe_id, recipe_deltas in deltas.items():
+        update_recipe_in_shopping_lists(recipe_id, recipe_deltas)
+    instance._loaded_values = {
+        field: getattr(instance, field) for field in RECIPE_INGREDIENT_ROW
+    }
+
+
+@receiver(pre_delete, sender=RecipeIngredient)
+def update_shopping_lists_on_ingredient_delete(sender, instance, origin,
+                                               **kwargs):
+    # Deleting a recipe or an ingredient cascades to the cart items or
+    # shopping list rows involved, which are accounted for on their own.
+    if not (
+        isinstance(origin, RecipeIngredient)
+        or isinstance(origin, QuerySet) and origin.model is RecipeIngredient
+    ):
+        return
+    update_recipe_in_shopping_lists(
+        instance.recipe_id, {instance.ingredient_id: -instance.amount}
+    )
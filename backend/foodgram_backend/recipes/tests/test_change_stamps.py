@@ -0,0 +1,210 @@
+
+from recipes.models import ChangeStamp, RecipeIngredient
+from rest_framework.test import APIClient
+
+from foodgram_backend.constants import (
+    POPULARITY_CHANGE_STAMP,
+    RECIPES_CHANGE_STAMP
+)
+from foodgram_backend.tests.utils import (
+    FoodgramTestCase,
+    create_ingredient,
+    create_recipe,
+    create_tag,
+    create_user
+)
+
+
+class RecipesChangeStampTests(FoodgramTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.tags = [create_tag(1), create_tag(2)]
+        cls.flour = create_ingredient('Flour')
+        cls.recipe = create_recipe(
+            create_user(1), cls.tags[:1], [(cls.flour, 200)]
+        )
+
+    def assertBumpsRecipesStamp(self, change, bumps=True):
+        version = ChangeStamp.get_version(RECIPES_CHANGE_STAMP)
+        with self.captureOnCommitCallbacks(execute=True):
+            change()
+        self.assertEqual(
+            ChangeStamp.get_version(RECIPES_CHANGE_STAMP) > version, bumps
+        )
+
+    def test_author_changes(self):
+        author = self.recipe.user
+        author.set_password('Other-password-2')
+        self.assertBumpsRecipesStamp(
+            lambda: author.save(update_fields=['password']), bumps=False
+        )
+        self.assertBumpsRecipesStamp(author.save, bumps=False)
+        self.assertBumpsRecipesStamp(lambda: create_user(2), bumps=False)
+
+        author.first_name = 'Renamed'
+        self.assertBumpsRecipesStamp(author.save)
+        author.email = 'renamed@example.com'
+        self.assertBumpsRecipesStamp(
+            lambda: author.save(update_fields=['email'])
+        )
+
+    def test_recipe_ingredient_changes(self):
+        recipe_ingredient = RecipeIngredient.objects.get(recipe=self.recipe)
+        recipe_ingredient.amount = 300
+        self.assertBumpsRecipesStamp(recipe_ingredient.save)
+        self.assertBumpsRecipesStamp(recipe_ingredient.delete)
+
+    def test_recipe_tag_changes(self):
+        self.assertBumpsRecipesStamp(
+            lambda: self.recipe.tags.add(self.tags[1])
+        )
+        self.assertBumpsRecipesStamp(
+            lambda: self.recipe.tags.remove(self.tags[0])
+        )
+        self.assertBumpsRecipesStamp(self.recipe.tags.clear)
+
+    def test_list_etag_changes_with_ingredients(self):
+        etag = self.client.get('/api/recipes/')['ETag']
+        RecipeIngredient.objects.filter(recipe=self.recipe).update(amount=1)
+        self.assertEqual(self.client.get('/api/recipes/')['ETag'], etag)
+
+        recipe_ingredient = RecipeIngredient.objects.get(recipe=self.recipe)
+        recipe_ingredient.amount = 2
+        with self.captureOnCommitCallbacks(execute=True):
+            recipe_ingredient.save()
+        self.assertNotEqual(self.client.get('/api/recipes/')['ETag'], etag)
+
+
+class ViewerChangeStampTests(FoodgramTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author, cls.reader = create_user(1), create_user(2)
+        cls.recipe = create_recipe(cls.author)
+
+    def setUp(self):
+        super().setUp()
+        self.clients = {}
+        for user in (self.author, self.reader):
+            self.clients[user] = APIClient()
+            self.clients[user].force_authenticate(user)
+
+    def get(self, user, **headers):
+        return self.clients[user].get(
+            f'/api/recipes/{self.recipe.pk}/', **headers
+        )
+
+    def test_favorite_changes_counters_in_validators(self):
+        recipes_version = ChangeStamp.get_version(RECIPES_CHANGE_STAMP)
+        author_etag = self.get(self.author)['ETag']
+        reader_etag = self.get(self.reader)['ETag']
+        anonymous = APIClient()
+        anonymous_etag = anonymous.get(
+            f'/api/recipes/{self.recipe.pk}/'
+        )['ETag']
+        self.assertEqual(
+            self.get(self.author, HTTP_IF_NONE_MATCH=author_etag).status_code,
+            304
+        )
+
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.clients[self.reader].post(
+                f'/api/recipes/{self.recipe.pk}/favorite/'
+            )
+        self.assertEqual(response.status_code, 201)
+
+        self.assertEqual(
+            ChangeStamp.get_version(RECIPES_CHANGE_STAMP), recipes_version
+        )
+        response = self.get(self.author, HTTP_IF_NONE_MATCH=author_etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['favorites_count'], 1)
+        response = anonymous.get(
+            f'/api/recipes/{self.recipe.pk}/',
+            HTTP_IF_NONE_MATCH=anonymous_etag
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['favorites_count'], 1)
+        self.assertNotEqual(response['ETag'], anonymous_etag)
+        response = self.get(self.reader, HTTP_IF_NONE_MATCH=reader_etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.json()['is_favorited'])
+
+    def test_cart_changes_list_validators(self):
+        anonymous = APIClient()
+        etag = anonymous.get('/api/recipes/')['ETag']
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.clients[self.reader].post(
+                f'/api/recipes/{self.recipe.pk}/shopping_cart/'
+            )
+
+        response = anonymous.get('/api/recipes/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['results'][0]['cart_count'], 1)
+        self.assertEqual(
+            anonymous.get(
+                '/api/recipes/', HTTP_IF_NONE_MATCH=response['ETag']
+            ).status_code,
+            304
+        )
+
+    def test_cached_response_shows_current_counters(self):
+        self.assertEqual(self.get(self.author)['X-Cache'], 'MISS')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.clients[self.reader].post(
+                f'/api/recipes/{self.recipe.pk}/shopping_cart/'
+            )
+
+        response = self.get(self.author)
+        self.assertEqual(response['X-Cache'], 'HIT')
+        self.assertEqual(response.json()['cart_count'], 1)
+
+
+class CatalogChangeStampTests(FoodgramTestCase):
+    def test_tag_validators_come_from_catalog(self):
+        create_tag(1)
+        etag = self.client.get('/api/tags/')['ETag']
+
+        with self.assertNumQueries(0):
+            response = self.client.get('/api/tags/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+    def test_tag_validators_follow_local_writes(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            tag = create_tag(1)
+        etag = self.client.get('/api/tags/')['ETag']
+
+        with self.captureOnCommitCallbacks(execute=True):
+            tag.name = 'Renamed'
+            tag.save()
+
+        response = self.client.get('/api/tags/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()[0]['name'], 'Renamed')
+
+
+class PopularityChangeStampTests(FoodgramTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.recipe = create_recipe(create_user(1))
+
+    def test_only_popularity_ordered_responses_follow_it(self):
+        client = APIClient()
+        urls = {
+            f'/api/recipes/{self.recipe.pk}/': False,
+            '/api/recipes/': False,
+            '/api/recipes/?ordering=popular': True,
+            '/api/recipes/popular/': True,
+        }
+        etags = {url: client.get(url)['ETag'] for url in urls}
+
+        ChangeStamp.bump(POPULARITY_CHANGE_STAMP)
+
+        for url, follows in urls.items():
+            with self.subTest(url=url):
+                response = client.get(url)
+                self.assertEqual(response['ETag'] != etags[url], follows)
+                self.assertEqual(
+                    response['X-Cache'], 'MISS' if follows else 'HIT'
+                )
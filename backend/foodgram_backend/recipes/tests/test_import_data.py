@@ -0,0 +1,40 @@
+import json
+import os
+import tempfile
+from io import StringIO
+
+from django.core.management import call_command
+
+from recipes.models import Ingredient
+
+from foodgram_backend.tests.utils import FoodgramTestCase
+
+
+class ImportDataTests(FoodgramTestCase):
+    def setUp(self):
+        super().setUp()
+        file = tempfile.NamedTemporaryFile(
+            'w', suffix='.json', delete=False
+        )
+        json.dump([
+            {'name': name, 'measurement_unit': 'g'}
+            for name in ('Flour', 'Milk', 'Flour', 'Salt', 'Milk')
+        ], file)
+        file.close()
+        self.addCleanup(os.remove, file.name)
+        self.path = file.name
+
+    def import_data(self, **options):
+        output = StringIO()
+        call_command(
+            'import_data', self.path, batch_size=2, stdout=output, **options
+        )
+        return output.getvalue()
+
+    def test_dry_run_counts_duplicates_across_batches_once(self):
+        self.assertIn('3 would be created', self.import_data(dry_run=True))
+        self.assertFalse(Ingredient.objects.exists())
+
+        self.assertIn('3 created', self.import_data())
+        self.assertEqual(Ingredient.objects.count(), 3)
+        self.assertIn('0 would be created', self.import_data(dry_run=True))
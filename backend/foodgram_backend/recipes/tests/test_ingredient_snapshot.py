@@ -0,0 +1,58 @@
+import gzip
+import json
+
+from rest_framework.test import APIClient
+
+from foodgram_backend.tests.utils import FoodgramTestCase, create_ingredient
+
+SNAPSHOT_URL = '/api/ingredients/snapshot/'
+
+
+class IngredientSnapshotTests(FoodgramTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        create_ingredient('Flour')
+        create_ingredient('Milk', 'ml')
+
+    def setUp(self):
+        super().setUp()
+        self.client = APIClient()
+
+    def get(self, **headers):
+        return self.client.get(SNAPSHOT_URL, **headers)
+
+    def test_encodings_have_distinct_etags(self):
+        identity = self.get()
+        compressed = self.get(HTTP_ACCEPT_ENCODING='gzip, deflate')
+
+        self.assertEqual(identity.status_code, 200)
+        self.assertEqual(compressed['Content-Encoding'], 'gzip')
+        self.assertEqual(
+            json.loads(gzip.decompress(compressed.content)),
+            json.loads(identity.content)
+        )
+        self.assertEqual(
+            compressed['ETag'], identity['ETag'][:-1] + '-gz"'
+        )
+        for response in (identity, compressed):
+            self.assertIn('Accept-Encoding', response['Vary'])
+
+    def test_etag_of_other_encoding_is_not_matched(self):
+        identity = self.get()
+        compressed = self.get(HTTP_ACCEPT_ENCODING='gzip')
+
+        self.assertEqual(
+            self.get(HTTP_IF_NONE_MATCH=identity['ETag']).status_code, 304
+        )
+        self.assertEqual(
+            self.get(
+                HTTP_ACCEPT_ENCODING='gzip',
+                HTTP_IF_NONE_MATCH=compressed['ETag']
+            ).status_code,
+            304
+        )
+        response = self.get(
+            HTTP_ACCEPT_ENCODING='gzip', HTTP_IF_NONE_MATCH=identity['ETag']
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Encoding'], 'gzip')
@@ -0,0 +1,43 @@
+from recipes.models import Recipe
+from recipes.pagination import KeysetPagination
+from rest_framework.exceptions import ParseError
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from foodgram_backend.tests.utils import (
+    FoodgramTestCase,
+    create_recipe,
+    create_user
+)
+
+
+class KeysetPaginationTests(FoodgramTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        author = create_user(1)
+        cls.recipes = [
+            create_recipe(author, name=f'Recipe {number}')
+            for number in range(5)
+        ]
+
+    def test_cursor_walks_newest_first(self):
+        url = '/api/recipes/?limit=2&cursor='
+        seen = []
+        while url:
+            data = self.client.get(url).json()
+            seen.extend(recipe['id'] for recipe in data['results'])
+            url = data['next']
+        self.assertEqual(
+            seen, [recipe.pk for recipe in reversed(self.recipes)]
+        )
+
+    def test_cursor_with_popular_ordering_is_rejected(self):
+        response = self.client.get('/api/recipes/?ordering=popular&cursor=')
+        self.assertEqual(response.status_code, 400)
+
+    def test_cursor_with_custom_ordering_is_rejected(self):
+        request = Request(APIRequestFactory().get('/api/recipes/?cursor='))
+        with self.assertRaises(ParseError):
+            KeysetPagination().paginate_queryset(
+                Recipe.objects.order_by('name'), request
+            )
@@ -0,0 +1,81 @@
+from io import StringIO
+
+from django.conf import settings
+from django.core.management import call_command
+
+from recipes.models import (
+    PopularityWatermark,
+    RecipePopularity,
+    UserFavoriteRecipe
+)
+
+from foodgram_backend.tests.utils import (
+    FoodgramTestCase,
+    create_recipe,
+    create_user
+)
+
+
+class RefreshRecipePopularityTests(FoodgramTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = create_user(1)
+        cls.fans = [create_user(number) for number in range(2, 5)]
+        cls.recipe = create_recipe(cls.author)
+
+    def refresh(self):
+        call_command('refresh_recipe_popularity', stdout=StringIO())
+        return RecipePopularity.objects.get(recipe=self.recipe).score
+
+    def test_folds_rows_committed_out_of_id_order(self):
+        UserFavoriteRecipe.objects.create(
+            user=self.fans[0], recipe=self.recipe, pk=10
+        )
+        single = self.refresh()
+
+        # A transaction that took id 5 before id 10 but committed later.
+        UserFavoriteRecipe.objects.create(
+            user=self.fans[1], recipe=self.recipe, pk=5
+        )
+        double = self.refresh()
+
+        self.assertAlmostEqual(double, single + 1, places=3)
+        self.assertEqual(self.refresh(), double)
+        watermark = PopularityWatermark.objects.get(source='favorites')
+        self.assertEqual(watermark.last_id, 10)
+        self.assertEqual(
+            [pk for pk, _ in watermark.gaps], [1, 2, 3, 4, 6, 7, 8, 9]
+        )
+
+    def test_gaps_below_settled_rows_are_forgotten(self):
+        for pk, fan in zip((3, 7), self.fans):
+            UserFavoriteRecipe.objects.create(
+                user=fan, recipe=self.recipe, pk=pk
+            )
+        with self.settings(RECIPE_POPULARITY={
+            **settings.RECIPE_POPULARITY, 'COMMIT_LAG_SECONDS': 0
+        }):
+            score = self.refresh()
+            self.assertEqual(self.refresh(), score)
+
+        watermark = PopularityWatermark.objects.get(source='favorites')
+        self.assertEqual(watermark.last_id, 7)
+        self.assertEqual(watermark.gaps, [])
+
+    def test_contiguous_rows_leave_no_state(self):
+        recipes = [create_recipe(self.author) for _ in range(30)]
+        UserFavoriteRecipe.objects.bulk_create(
+            UserFavoriteRecipe(user=fan, recipe=recipe)
+            for fan in self.fans for recipe in recipes
+        )
+        call_command(
+            'refresh_recipe_popularity', batch_size=7, stdout=StringIO()
+        )
+
+        watermark = PopularityWatermark.objects.get(source='favorites')
+        self.assertEqual(
+            watermark.last_id,
+            UserFavoriteRecipe.objects.order_by('pk').last().pk
+        )
+        self.assertEqual(watermark.gaps, [])
+        self.assertEqual(RecipePopularity.objects.count(), 30)
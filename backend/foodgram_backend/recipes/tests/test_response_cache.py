@@ -0,0 +1,45 @@
+import shutil
+import tempfile
+from io import StringIO
+
+from django.core.management import CommandError, call_command
+
+from foodgram_backend.tests.utils import (
+    FoodgramTestCase,
+    create_recipe,
+    create_user
+)
+
+
+class RecipeCacheStatsTests(FoodgramTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        create_recipe(create_user(1))
+
+    def test_process_local_cache_is_rejected(self):
+        with self.assertRaisesMessage(CommandError, 'local to each process'):
+            call_command('recipe_cache_stats')
+
+    def test_shared_cache_counts_requests(self):
+        location = tempfile.mkdtemp(prefix='foodgram-cache-')
+        self.addCleanup(shutil.rmtree, location)
+        caches_setting = {
+            'default': {
+                'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            },
+            'shared': {
+                'BACKEND':
+                    'django.core.cache.backends.filebased.FileBasedCache',
+                'LOCATION': location,
+            },
+        }
+        output = StringIO()
+        with self.settings(
+            CACHES=caches_setting,
+            RECIPE_RESPONSE_CACHE={'ALIAS': 'shared', 'TIMEOUT': 60}
+        ):
+            for _ in range(3):
+                self.client.get('/api/recipes/')
+            call_command('recipe_cache_stats', stdout=output)
+
+        self.assertIn('Requests: 3, hits: 2, misses: 1', output.getvalue())
@@ -0,0 +1,83 @@
+from django.contrib.auth.models import AnonymousUser
+
+from recipes.models import Recipe, Tag, UserFavoriteRecipe
+from recipes.renderers import FastJSONRenderer
+from recipes.serializers import RecipeRowSerializer, RecipeSerializer
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+from users.models import UserSubscription
+
+from foodgram_backend.tests.utils import (
+    FoodgramTestCase,
+    create_ingredient,
+    create_recipe,
+    create_tag,
+    create_user
+)
+
+
+class RecipeRowSerializerParityTests(FoodgramTestCase):
+    """The row serializer renders the same bytes as RecipeSerializer."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.viewer = create_user(1)
+        followed, unfollowed = create_user(2), create_user(3)
+        followed.first_name, followed.last_name = 'Алёна', 'Ωμέγα'
+        followed.save()
+        UserSubscription.objects.create(from_user=cls.viewer, to_user=followed)
+
+        tag = create_tag(1)
+        Tag.objects.filter(pk=tag.pk).update(name='Завтрак 🍳')
+        sugar = create_ingredient('Сахар', 'ч. л.')
+        flour = create_ingredient('Flour')
+        recipes = [
+            create_recipe(
+                followed, [tag], [(sugar, 2), (flour, 300)], name='Блины'
+            ),
+            create_recipe(unfollowed, [tag], [(flour, 50)], name='Bread'),
+            create_recipe(unfollowed, name='Water'),
+            create_recipe(None, [create_tag(2)], [(sugar, 1)], name='Orphan'),
+            create_recipe(followed, [], [(sugar, 5)], name='No tags'),
+        ]
+        Recipe.objects.filter(pk=recipes[0].pk).update(
+            text='Смешать «всё» — и жарить.\nЗатем подать 🥞'
+        )
+        Recipe.objects.filter(pk=recipes[2].pk).update(image='')
+        UserFavoriteRecipe.objects.create(user=cls.viewer, recipe=recipes[1])
+        Recipe.objects.filter(pk=recipes[1].pk).update(favorites_count=1)
+
+    def context(self, user):
+        request = Request(APIRequestFactory().get('/api/recipes/'))
+        request.user = user
+        return {'request': request}
+
+    def render_serializer(self, user):
+        return JSONRenderer().render(RecipeSerializer(
+            Recipe.objects.for_representation(user).order_by('-id'),
+            many=True, context=self.context(user)
+        ).data)
+
+    def render_rows(self, user):
+        return FastJSONRenderer().render(RecipeRowSerializer(
+            Recipe.objects.with_viewer_flags(user).order_by('-id').values(
+                *RecipeRowSerializer.row_fields
+            ),
+            many=True, context=self.context(user)
+        ).data)
+
+    def test_same_output(self):
+        for user, subscribed in (
+            (self.viewer, True), (AnonymousUser(), False)
+        ):
+            with self.subTest(user=user):
+                expected = self.render_serializer(user)
+                self.assertEqual(self.render_rows(user), expected)
+                content = expected.decode()
+                self.assertIn('Блины', content)
+                self.assertIn('"author":null', content)
+                self.assertIn('"image":null', content)
+                self.assertEqual(
+                    '"is_subscribed":true' in content, subscribed
+                )
@@ -0,0 +1,173 @@
+from io import StringIO
+
+from django.core.management import call_command
+
+from recipes.models import RecipeIngredient, ShoppingListIngredient
+from rest_framework.test import APIClient
+
+from foodgram_backend.tests.utils import (
+    FoodgramTestCase,
+    create_ingredient,
+    create_recipe,
+    create_tag,
+    create_user
+)
+
+
+class ShoppingListTotalsTests(FoodgramTestCase):
+    """Shopping list totals follow every way of editing recipe ingredients."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = create_user(1)
+        cls.buyers = [create_user(2), create_user(3)]
+        cls.tag = create_tag(1)
+        cls.flour, cls.milk, cls.salt = (
+            create_ingredient(name) for name in ('Flour', 'Milk', 'Salt')
+        )
+        cls.recipe = create_recipe(
+            cls.author, [cls.tag], [(cls.flour, 200), (cls.milk, 300)]
+        )
+        cls.other_recipe = create_recipe(
+            cls.author, [cls.tag], [(cls.flour, 50)], name='Bread'
+        )
+
+    def setUp(self):
+        super().setUp()
+        self.client = APIClient()
+        self.client.force_authenticate(self.author)
+        for buyer in self.buyers:
+            client = APIClient()
+            client.force_authenticate(buyer)
+            for recipe in (self.recipe, self.other_recipe):
+                response = client.post(
+                    f'/api/recipes/{recipe.pk}/shopping_cart/'
+                )
+                self.assertEqual(response.status_code, 200)
+
+    def assertShoppingListsConsistent(self, carts=2):
+        output = StringIO()
+        call_command('rebuild_shopping_lists', verify=True, stdout=output)
+        self.assertIn(
+            f'0 of {carts} shopping lists differ', output.getvalue()
+        )
+
+    def totals(self, user):
+        return dict(
+            ShoppingListIngredient.objects.filter(user=user).values_list(
+                'ingredient__name', 'total_amount'
+            )
+        )
+
+    def test_edit_through_recipe_ingredients_endpoint(self):
+        recipe_ingredient = RecipeIngredient.objects.get(
+            recipe=self.recipe, ingredient=self.flour
+        )
+
+        response = self.client.patch(
+            f'/api/recipesingredients/{recipe_ingredient.pk}/',
+            {'amount': 500}, format='json'
+        )
+
+        self.assertEqual(response.status_code, 200)
+        self.assertShoppingListsConsistent()
+        self.assertEqual(
+            self.totals(self.buyers[0]), {'Flour': 550, 'Milk': 300}
+        )
+
+    def test_delete_through_recipe_ingredients_endpoint(self):
+        recipe_ingredient = RecipeIngredient.objects.get(
+            recipe=self.recipe, ingredient=self.milk
+        )
+
+        response = self.client.delete(
+            f'/api/recipesingredients/{recipe_ingredient.pk}/'
+        )
+
+        self.assertEqual(response.status_code, 204)
+        self.assertShoppingListsConsistent()
+        self.assertEqual(self.totals(self.buyers[1]), {'Flour': 250})
+
+    def test_model_save_and_delete(self):
+        RecipeIngredient.objects.create(
+            recipe=self.recipe, ingredient=self.salt, amount=5
+        )
+        recipe_ingredient = RecipeIngredient.objects.get(
+            recipe=self.recipe, ingredient=self.flour
+        )
+        recipe_ingredient.recipe = self.other_recipe
+        recipe_ingredient.ingredient = self.milk
+        recipe_ingredient.save()
+        RecipeIngredient.objects.filter(ingredient=self.salt).delete()
+
+        self.assertShoppingListsConsistent()
+        self.assertEqual(
+            self.totals(self.buyers[0]), {'Flour': 50, 'Milk': 500}
+        )
+
+    def test_recipe_update(self):
+        response = self.client.patch(
+            f'/api/recipes/{self.recipe.pk}/',
+            {
+                'ingredients': [
+                    {'id': self.flour.pk, 'amount': 100},
+                    {'id': self.salt.pk, 'amount': 10},
+                ],
+                'tags': [self.tag.pk],
+            },
+            format='json'
+        )
+
+        self.assertEqual(response.status_code, 200)
+        self.assertShoppingListsConsistent()
+        self.assertEqual(
+            self.totals(self.buyers[0]), {'Flour': 150, 'Salt': 10}
+        )
+
+    def test_recipe_and_ingredient_deletion(self):
+        self.recipe.delete()
+        self.assertShoppingListsConsistent()
+        self.assertEqual(self.totals(self.buyers[0]), {'Flour': 50})
+
+        self.flour.delete()
+        self.assertShoppingListsConsistent()
+        self.assertEqual(self.totals(self.buyers[0]), {})
+
+    def test_bulk_cart_removal(self):
+        client = APIClient()
+        client.force_authenticate(self.buyers[0])
+        response = client.delete(
+            '/api/recipes/shopping_cart/',
+            {'ids': [self.recipe.pk, self.other_recipe.pk]},
+            format='json'
+        )
+
+        self.assertEqual(response.status_code, 200)
+        self.assertShoppingListsConsistent(carts=1)
+        self.assertEqual(self.totals(self.buyers[0]), {})
+        self.assertEqual(
+            self.totals(self.buyers[1]), {'Flour': 250, 'Milk': 300}
+        )
+
+    def test_download_follows_ingredient_edits(self):
+        client = APIClient()
+        client.force_authenticate(self.buyers[0])
+
+        def download():
+            return client.get(
+                '/api/recipes/download_shopping_cart/'
+            ).getvalue().decode()
+
+        self.assertIn('Flour --- 250 (g)', download())
+        recipe_ingredient = RecipeIngredient.objects.get(
+            recipe=self.recipe, ingredient=self.flour
+        )
+        self.client.patch(
+            f'/api/recipesingredients/{recipe_ingredient.pk}/',
+            {'amount': 50}, format='json'
+        )
+        self.assertIn('Flour --- 100 (g)', download())
+
+        self.flour.name = 'Rye flour'
+        self.flour.save()
+        self.assertIn('Rye flour --- 100 (g)', download())
@@ -1,11 +1,15 @@
-from django.db.models import F, Sum
-from django.http import HttpResponse
+import json
+
+from django.db import transaction
+from django.http import HttpResponse, StreamingHttpResponse
 from django.shortcuts import get_object_or_404
+from django.utils.decorators import method_decorator
 
 from django_filters.rest_framework import DjangoFilterBackend
-from recipes.filters import IngredientFilter, RecipeFilter
+from recipes.filters import RecipeFilter
 from rest_framework import serializers, status, viewsets
 from rest_framework.decorators import action
+from rest_framework.exceptions import NotFound
 from rest_framework.permissions import (
     AllowAny,
     IsAuthenticated,
@@ -13,8 +17,23 @@ from rest_framework.permissions import (
 )
 from rest_framework.response import Response
 from rest_framework.views import APIView
+from users.models import MyUser, UserSubscription
+
+from foodgram_backend.constants import (
+    INGREDIENT_SEARCH_LIMIT,
+    INGREDIENTS_CHANGE_STAMP,
+    POPULAR_RECIPES_LIMIT,
+    POPULAR_RECIPES_LIMIT_MAX,
+    POPULARITY_CHANGE_STAMP,
+    RECIPES_CHANGE_STAMP,
+    TAGS_CHANGE_STAMP
+)
 
+from .catalog import catalog
+from .conditional import accepts_gzip, conditional_on, viewer_stamp_name
+from .ingredient_snapshot import build_delta
 from .models import (
+    ChangeStamp,
     Ingredient,
     Recipe,
     RecipeIngredient,
@@ -22,40 +41,203 @@ from .models import (
     Tag,
     UserFavoriteRecipe
 )
+from .pagination import KeysetPagination, RecipePagination
 from .permissions import IsRecipeAuthor
+from .renderers import CSVRenderer, PDFRenderer, PlainTextRenderer
+from .response_cache import ordering_stamp_names, recipe_response_cache
 from .serializers import (
     FavoriteSerializer,
     IngredientSerializer,
+    RecipeIdsSerializer,
     RecipeIngredientSerializer,
+    RecipeRowSerializer,
     RecipeSerializer,
     ShoppingCartSerializer,
     TagSerializer
 )
+from .shopping_cart import (
+    add_recipes_to_shopping_list,
+    defer_shopping_list_updates,
+    export_shopping_cart
+)
+
 
+def _get_catalog_pk(kwargs):
+    try:
+        return int(kwargs['pk'])
+    except ValueError:
+        raise NotFound
 
+
+@method_decorator(conditional_on(TAGS_CHANGE_STAMP), name='list')
+@method_decorator(conditional_on(TAGS_CHANGE_STAMP), name='retrieve')
 class TagViewSet(viewsets.ReadOnlyModelViewSet):
     queryset = Tag.objects.all()
     serializer_class = TagSerializer
     pagination_class = None
     permission_classes = [AllowAny]
+    query_budget = 4
+    read_replica = True
+
+    def list(self, request, *args, **kwargs):
+        if request.accepted_renderer.format == 'json':
+            return HttpResponse(
+                catalog.tags_json(), content_type='application/json'
+            )
+        return Response(list(catalog.tag_data().values()))
+
+    def retrieve(self, request, *args, **kwargs):
+        tag = catalog.tag_data().get(_get_catalog_pk(kwargs))
+        if tag is None:
+            raise NotFound
+        return Response(tag)
 
 
+@method_decorator(conditional_on(INGREDIENTS_CHANGE_STAMP), name='list')
+@method_decorator(conditional_on(INGREDIENTS_CHANGE_STAMP), name='retrieve')
+@method_decorator(
+    conditional_on(INGREDIENTS_CHANGE_STAMP, per_encoding=True),
+    name='snapshot'
+)
 class IngredientViewSet(viewsets.ReadOnlyModelViewSet):
     queryset = Ingredient.objects.all()
     serializer_class = IngredientSerializer
     pagination_class = None
     permission_classes = [AllowAny]
+    query_budget = {'list': 3, 'retrieve': 3, 'snapshot': 6}
+    read_replica = True
 
-    filter_backends = [DjangoFilterBackend]
-    filterset_class = IngredientFilter
+    def list(self, request, *args, **kwargs):
+        name = request.query_params.get('name')
+        starts_with = request.query_params.get('starts_with')
+        index = catalog.ingredient_index()
+        if starts_with:
+            ingredients = index.search(
+                starts_with, INGREDIENT_SEARCH_LIMIT, substring=False
+            )
+        elif name:
+            ingredients = index.search(name, INGREDIENT_SEARCH_LIMIT)
+        else:
+            ingredients = index.all()
+        return Response(ingredients)
+
+    def retrieve(self, request, *args, **kwargs):
+        ingredient = catalog.ingredients().get(_get_catalog_pk(kwargs))
+        if ingredient is None:
+            raise NotFound
+        return Response(self.get_serializer(ingredient).data)
+
+    @action(detail=False, methods=['get'])
+    def snapshot(self, request):
+        """Whole catalog as columnar arrays, or changes after `since`."""
+        since = request.query_params.get('since')
+        if since:
+            try:
+                since = int(since)
+            except ValueError:
+                return Response(
+                    {'detail': 'since must be an integer version.'},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+            if since > 0:
+                delta = build_delta(since)
+                if since <= delta['version']:
+                    return Response(delta)
+
+        snapshot = catalog.ingredient_snapshot()
+        if request.accepted_renderer.format != 'json':
+            return Response(json.loads(snapshot['content']))
+        if accepts_gzip(request):
+            response = HttpResponse(
+                snapshot['gzip'], content_type='application/json'
+            )
+            response['Content-Encoding'] = 'gzip'
+        else:
+            response = HttpResponse(
+                snapshot['content'], content_type='application/json'
+            )
+        return response
 
 
+@method_decorator(
+    conditional_on(
+        RECIPES_CHANGE_STAMP, TAGS_CHANGE_STAMP, INGREDIENTS_CHANGE_STAMP,
+        per_user=True, counters=True, extra_names=ordering_stamp_names
+    ),
+    name='list'
+)
+@method_decorator(
+    conditional_on(
+        RECIPES_CHANGE_STAMP, TAGS_CHANGE_STAMP, INGREDIENTS_CHANGE_STAMP,
+        per_user=True, counters=True
+    ),
+    name='retrieve'
+)
+@method_decorator(
+    conditional_on(
+        RECIPES_CHANGE_STAMP, TAGS_CHANGE_STAMP, INGREDIENTS_CHANGE_STAMP,
+        per_user=True, counters=True, extra_names=ordering_stamp_names
+    ),
+    name='feed'
+)
+@method_decorator(
+    conditional_on(
+        RECIPES_CHANGE_STAMP, TAGS_CHANGE_STAMP, INGREDIENTS_CHANGE_STAMP,
+        POPULARITY_CHANGE_STAMP, per_user=True, counters=True
+    ),
+    name='popular'
+)
 class RecipeViewSet(viewsets.ModelViewSet):
-    queryset = Recipe.objects.all().select_related('user')
+    queryset = Recipe.objects.all()
     serializer_class = RecipeSerializer
     permission_classes = [IsAuthenticatedOrReadOnly, IsRecipeAuthor]
+    pagination_class = RecipePagination
     filter_backends = [DjangoFilterBackend]
     filterset_class = RecipeFilter
+    query_budget = {
+        'list': 12,
+        'retrieve': 10,
+        'create': 24,
+        'update': 24,
+        'partial_update': 24,
+        'destroy': 16,
+        'download_shopping_cart': 4,
+        'feed': 10,
+        'popular': 10,
+    }
+    read_replica = True
+
+    def get_queryset(self):
+        if self.action in ('list', 'feed', 'popular'):
+            return Recipe.objects.with_viewer_flags(self.request.user)
+        return Recipe.objects.for_representation(self.request.user)
+
+    def list_rows(self, queryset):
+        """Paginated list response built by the row serializer."""
+        queryset = queryset.values(*RecipeRowSerializer.row_fields)
+        page = self.paginate_queryset(queryset)
+        serializer = RecipeRowSerializer(
+            queryset if page is None else page,
+            many=True,
+            context=self.get_serializer_context()
+        )
+        if page is None:
+            return Response(serializer.data)
+        return self.get_paginated_response(serializer.data)
+
+    def list(self, request, *args, **kwargs):
+        return recipe_response_cache.serve(
+            request, 'list',
+            lambda: self.list_rows(self.filter_queryset(self.get_queryset()))
+        )
+
+    def retrieve(self, request, *args, **kwargs):
+        return recipe_response_cache.serve(
+            request, 'retrieve',
+            lambda: super(RecipeViewSet, self).retrieve(
+                request, *args, **kwargs
+            )
+        )
 
     def create(self, request, *args, **kwargs):
         serializer = self.get_serializer(data=request.data)
@@ -77,39 +259,70 @@ class RecipeViewSet(viewsets.ModelViewSet):
     @action(
         detail=False,
         methods=['get'],
-        url_path='download_shopping_cart',
-        permission_classes=[IsAuthenticated]
+        permission_classes=[IsAuthenticated],
+        pagination_class=KeysetPagination
     )
-    def download_shopping_cart(self, request):
-        shopping_cart_data = Recipe.objects.filter(
-            shopping_cart_users=request.user
-        ).values(
-            ingredient_name=F('recipe_ingredients__ingredient__name'),
-            measurement_unit=F(
-                'recipe_ingredients__ingredient__measurement_unit'
-            ),
-        ).annotate(
-            total_quantity=Sum('recipe_ingredients__amount')
+    def feed(self, request):
+        """Newest recipes of the authors the user is subscribed to."""
+        return self.list_rows(
+            self.filter_queryset(self.get_queryset()).filter(
+                user_id__in=UserSubscription.objects.filter(
+                    from_user=request.user
+                ).values('to_user_id')
+            )
         )
 
-        shopping_cart_text = "\n".join(
-            f"{data['ingredient_name']} ---"
-            + f" {data['total_quantity']} ({data['measurement_unit']})"
-            for data in shopping_cart_data
+    @action(detail=False, methods=['get'], pagination_class=None)
+    def popular(self, request):
+        """Top recipes by time-decayed favorites and cart additions."""
+        try:
+            limit = int(request.query_params.get(
+                'limit', POPULAR_RECIPES_LIMIT
+            ))
+        except ValueError:
+            limit = 0
+        if not 0 < limit <= POPULAR_RECIPES_LIMIT_MAX:
+            return Response(
+                {
+                    'detail': 'limit must be an integer from 1 to '
+                              f'{POPULAR_RECIPES_LIMIT_MAX}.'
+                },
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        return recipe_response_cache.serve(
+            request, 'popular',
+            lambda: self.list_rows(
+                self.filter_queryset(self.get_queryset()).filter(
+                    popularity__isnull=False
+                ).order_by('-popularity__score', '-id')[:limit]
+            )
         )
 
-        response = HttpResponse(
-            shopping_cart_text, content_type='text/plain'
+    @action(
+        detail=False,
+        methods=['get'],
+        url_path='download_shopping_cart',
+        permission_classes=[IsAuthenticated],
+        renderer_classes=[PlainTextRenderer, CSVRenderer, PDFRenderer]
+    )
+    def download_shopping_cart(self, request, format=None):
+        renderer = request.accepted_renderer
+        response = StreamingHttpResponse(
+            export_shopping_cart(request.user, renderer.format),
+            content_type=renderer.media_type
+            + (f'; charset={renderer.charset}' if renderer.charset else '')
         )
         response['Content-Disposition'] = (
-            'attachment; filename="shopping_cart.txt"'
+            f'attachment; filename="shopping_cart.{renderer.format}"'
         )
         return response
 
 
 class FavoriteRecipeView(APIView):
     permission_classes = [IsAuthenticated]
+    query_budget = {'post': 12, 'delete': 10}
 
+    @transaction.atomic
     def post(self, request, pk=None):
         recipe = get_object_or_404(Recipe, pk=pk)
         user_favorite, created = UserFavoriteRecipe.objects.get_or_create(
@@ -121,12 +334,16 @@ class FavoriteRecipeView(APIView):
                 {'detail': 'Recipe already in favorites.'},
                 status=status.HTTP_400_BAD_REQUEST
             )
+        Recipe.objects.filter(pk=recipe.pk).change_counter(
+            'favorites_count', 1
+        )
 
         serializer = FavoriteSerializer(
             recipe, context={'request': request}
         )
         return Response(serializer.data, status=status.HTTP_201_CREATED)
 
+    @transaction.atomic
     def delete(self, request, pk=None):
         recipe = get_object_or_404(Recipe, pk=pk)
         try:
@@ -140,17 +357,28 @@ class FavoriteRecipeView(APIView):
                 {'detail': 'Recipe not in favorites.'},
                 status=status.HTTP_400_BAD_REQUEST
             )
+        Recipe.objects.filter(pk=recipe.pk).change_counter(
+            'favorites_count', -1
+        )
 
         return Response(status=status.HTTP_204_NO_CONTENT)
 
 
 class ShoppingCartView(APIView):
     permission_classes = [IsAuthenticated]
+    query_budget = {'post': 20, 'delete': 18}
 
+    @transaction.atomic
     def post(self, request, pk=None):
         recipe = get_object_or_404(Recipe, pk=pk)
         user = request.user
-        ShoppingCartItem.objects.get_or_create(user=user, recipe=recipe)
+        cart_item, created = ShoppingCartItem.objects.get_or_create(
+            user=user, recipe=recipe
+        )
+        if created:
+            Recipe.objects.filter(pk=recipe.pk).change_counter(
+                'cart_count', 1
+            )
 
         serializer = ShoppingCartSerializer(
             recipe, context={'request': request}
@@ -159,14 +387,127 @@ class ShoppingCartView(APIView):
 
         return Response(response_data, status=status.HTTP_200_OK)
 
+    @transaction.atomic
     def delete(self, request, pk=None):
         recipe = get_object_or_404(Recipe, pk=pk)
         user = request.user
-        ShoppingCartItem.objects.filter(user=user, recipe=recipe).delete()
+        deleted, _ = ShoppingCartItem.objects.filter(
+            user=user, recipe=recipe
+        ).delete()
+        if deleted:
+            Recipe.objects.filter(pk=recipe.pk).change_counter(
+                'cart_count', -deleted
+            )
 
         return Response(status=status.HTTP_204_NO_CONTENT)
 
 
+class BulkRecipeRelationView(APIView):
+    """Add or remove many recipes of the current user in one request.
+
+    Rows are inserted with bulk_create, which sends no post_save, so
+    counters, stamps and derived data of added recipes are updated here.
+    Deletes go through delete() and its signals.
+    """
+
+    permission_classes = [IsAuthenticated]
+    query_budget = 12
+    model = None
+    counter_field = None
+
+    def get_ids(self, request):
+        serializer = RecipeIdsSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        return serializer.validated_data['ids']
+
+    def get_state(self, request, ids):
+        list(
+            MyUser.objects.select_for_update().filter(
+                pk=request.user.pk
+            ).values_list('pk', flat=True)
+        )
+        existing = set(
+            Recipe.objects.filter(pk__in=ids).values_list('pk', flat=True)
+        )
+        present = set(
+            self.model.objects.filter(
+                user=request.user, recipe_id__in=existing
+            ).values_list('recipe_id', flat=True)
+        )
+        return existing, present
+
+    def changed(self, user, recipe_ids, delta):
+        Recipe.objects.filter(pk__in=recipe_ids).change_counter(
+            self.counter_field, delta
+        )
+        ChangeStamp.bump_on_commit(viewer_stamp_name(user.pk))
+
+    def remove(self, items):
+        items.delete()
+
+    def results(self, ids, existing, changed, changed_status,
+                unchanged_status):
+        return Response({
+            'results': [
+                {
+                    'id': pk,
+                    'status': (
+                        'not_found' if pk not in existing
+                        else changed_status if pk in changed
+                        else unchanged_status
+                    )
+                }
+                for pk in ids
+            ]
+        })
+
+    @transaction.atomic
+    def post(self, request):
+        ids = self.get_ids(request)
+        existing, present = self.get_state(request, ids)
+        added = existing - present
+        if added:
+            self.model.objects.bulk_create([
+                self.model(user=request.user, recipe_id=pk) for pk in added
+            ])
+            self.changed(request.user, added, 1)
+        return self.results(ids, existing, added, 'added', 'exists')
+
+    @transaction.atomic
+    def delete(self, request):
+        ids = self.get_ids(request)
+        existing, present = self.get_state(request, ids)
+        if present:
+            items = self.model.objects.filter(
+                user=request.user, recipe_id__in=present
+            )
+            self.remove(items)
+            self.changed(request.user, present, -1)
+        return self.results(ids, existing, present, 'removed', 'missing')
+
+
+class BulkFavoriteRecipeView(BulkRecipeRelationView):
+    model = UserFavoriteRecipe
+    counter_field = 'favorites_count'
+
+
+class BulkShoppingCartView(BulkRecipeRelationView):
+    model = ShoppingCartItem
+    counter_field = 'cart_count'
+    query_budget = 18
+
+    def remove(self, items):
+        # The pre_delete receiver of each item takes its recipe off the
+        # shopping list; collect them into a single update.
+        with defer_shopping_list_updates():
+            super().remove(items)
+
+    def changed(self, user, recipe_ids, delta):
+        super().changed(user, recipe_ids, delta)
+        if delta > 0:
+            add_recipes_to_shopping_list(user.pk, recipe_ids)
+
+
 class RecipeIngredientViewSet(viewsets.ModelViewSet):
     queryset = RecipeIngredient.objects.all()
     serializer_class = RecipeIngredientSerializer
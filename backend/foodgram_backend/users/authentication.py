@@ -0,0 +1,108 @@
+import copy
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import caches
+
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.authtoken.models import Token
+
+
+class TokenCache:
+    """Bounded in-process LRU of token -> (user, token) with a TTL.
+
+    When a shared cache alias is configured, entries are also stored
+    there so other workers can reuse them. Entries of other workers' LRUs
+    expire after the TTL, which bounds how long a revoked token can still
+    be accepted there.
+    """
+
+    def __init__(self):
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    @property
+    def config(self):
+        return settings.TOKEN_AUTH_CACHE
+
+    @property
+    def shared(self):
+        alias = self.config['ALIAS']
+        return caches[alias] if alias else None
+
+    def _shared_key(self, key):
+        return f'auth:token:{key}'
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                expires, value = entry
+                if expires > time.monotonic():
+                    self._entries.move_to_end(key)
+                    return value
+                del self._entries[key]
+        if self.shared is None:
+            return None
+        value = self.shared.get(self._shared_key(key))
+        if value is not None:
+            self._store(key, value)
+        return value
+
+    def _store(self, key, value):
+        with self._lock:
+            self._entries[key] = (
+                time.monotonic() + self.config['TIMEOUT'], value
+            )
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.config['MAX_SIZE']:
+                self._entries.popitem(last=False)
+
+    def set(self, key, value):
+        self._store(key, value)
+        if self.shared is not None:
+            self.shared.set(
+                self._shared_key(key), value, self.config['TIMEOUT']
+            )
+
+    def invalidate(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+        if self.shared is not None:
+            self.shared.delete(self._shared_key(key))
+
+    def invalidate_user(self, user_id):
+        with self._lock:
+            keys = {
+                key for key, (_, (user, _)) in self._entries.items()
+                if user.pk == user_id
+            }
+        if self.shared is not None:
+            keys.update(
+                Token.objects.filter(
+                    user_id=user_id
+                ).values_list('key', flat=True)
+            )
+        for key in keys:
+            self.invalidate(key)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+token_cache = TokenCache()
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """TokenAuthentication that skips the token/user query on cache hits."""
+
+    def authenticate_credentials(self, key):
+        cached = token_cache.get(key)
+        if cached is None:
+            cached = super().authenticate_credentials(key)
+            token_cache.set(key, cached)
+        user, token = cached
+        return copy.copy(user), token
@@ -7,6 +7,19 @@ from .models import MyUser, UserSubscription
 UserModel = get_user_model()
 
 
+def get_subscribed_ids(context):
+    """Return ids of authors the request user follows, cached in context."""
+    if 'subscribed_ids' not in context:
+        request = context.get('request')
+        user = request.user if request else None
+        context['subscribed_ids'] = set(
+            UserSubscription.objects.filter(
+                from_user=user
+            ).values_list('to_user_id', flat=True)
+        ) if user and user.is_authenticated else set()
+    return context['subscribed_ids']
+
+
 class MyUserCreateSerializer(serializers.ModelSerializer):
     first_name = serializers.CharField(max_length=150, required=True)
     last_name = serializers.CharField(max_length=150, required=True)
@@ -35,6 +48,9 @@ class MyUserSubscriptionSerializer(serializers.ModelSerializer):
         ]
 
     def get_is_subscribed(self, instance):
+        annotated = getattr(instance, 'is_subscribed', None)
+        if annotated is not None:
+            return annotated
         user = self.context.get('request', None).user
         return user.is_authenticated and user.subscriptions.filter(
             id=instance.id
@@ -42,7 +58,9 @@ class MyUserSubscriptionSerializer(serializers.ModelSerializer):
 
     def get_recipes(self, instance):
         from recipes.serializers import FavoriteSerializer
-        recipes = instance.recipe_set.all()
+        recipes = getattr(instance, 'subscription_recipes', None)
+        if recipes is None:
+            recipes = instance.recipe_set.all()
         request = self.context.get('request')
         favorite_serializer = FavoriteSerializer(
             recipes, many=True, context={'request': request}
@@ -50,6 +68,9 @@ class MyUserSubscriptionSerializer(serializers.ModelSerializer):
         return favorite_serializer.data
 
     def get_recipes_count(self, instance):
+        annotated = getattr(instance, 'recipes_count', None)
+        if annotated is not None:
+            return annotated
         return instance.recipe_set.count()
 
 
@@ -64,12 +85,21 @@ class MyUserProfileSerializer(serializers.ModelSerializer):
         ]
 
     def get_is_subscribed(self, instance):
+        annotated = getattr(instance, 'is_subscribed', None)
+        if annotated is not None:
+            return annotated
         user = self.context['request'].user
         return user.is_authenticated and user.subscriptions.filter(
             id=instance.id
         ).exists()
 
 
+class RecipeAuthorSerializer(MyUserProfileSerializer):
+
+    def get_is_subscribed(self, instance):
+        return instance.id in get_subscribed_ids(self.context)
+
+
 class SubscribeUserSerializer(serializers.ModelSerializer):
     is_subscribed = serializers.SerializerMethodField()
 
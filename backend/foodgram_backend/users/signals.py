@@ -0,0 +1,26 @@
+from django.contrib.auth.signals import user_logged_out
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from rest_framework.authtoken.models import Token
+
+from .authentication import token_cache
+from .models import MyUser
+
+
+@receiver(post_delete, sender=Token)
+def invalidate_deleted_token(sender, instance, **kwargs):
+    token_cache.invalidate(instance.key)
+
+
+@receiver(post_save, sender=MyUser)
+def invalidate_user_tokens(sender, instance, update_fields=None, **kwargs):
+    if update_fields is not None and set(update_fields) <= {'last_login'}:
+        return
+    token_cache.invalidate_user(instance.pk)
+
+
+@receiver(user_logged_out)
+def invalidate_logged_out_user_tokens(sender, user, **kwargs):
+    if user is not None:
+        token_cache.invalidate_user(user.pk)
@@ -0,0 +1,53 @@
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+from users.authentication import token_cache
+
+from foodgram_backend.tests.utils import FoodgramTestCase, create_user
+
+
+class SetPasswordTests(FoodgramTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.user = create_user(1)
+        self.token = Token.objects.create(user=self.user)
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {self.token.key}')
+
+    def set_password(self):
+        return self.client.post('/api/users/set_password/', {
+            'current_password': 'Secret-password-1',
+            'new_password': 'Other-password-2',
+        })
+
+    def test_saves_only_the_password(self):
+        with CaptureQueriesContext(connection) as context:
+            response = self.set_password()
+
+        self.assertEqual(response.status_code, 204)
+        updates = [
+            query['sql'] for query in context.captured_queries
+            if query['sql'].startswith('UPDATE "users_myuser"')
+        ]
+        self.assertEqual(len(updates), 1)
+        self.assertNotIn('"email"', updates[0])
+        self.user.refresh_from_db()
+        self.assertTrue(self.user.check_password('Other-password-2'))
+
+    def test_drops_cached_credentials(self):
+        for alias in (None, 'default'):
+            with self.subTest(alias=alias), self.settings(TOKEN_AUTH_CACHE={
+                'TIMEOUT': 30, 'MAX_SIZE': 100, 'ALIAS': alias
+            }):
+                self.assertEqual(
+                    self.client.get('/api/users/me/').status_code, 200
+                )
+                self.assertIsNotNone(token_cache.get(self.token.key))
+
+                self.assertEqual(self.set_password().status_code, 204)
+                self.assertIsNone(token_cache.get(self.token.key))
+                self.user.set_password('Secret-password-1')
+                self.user.save(update_fields=['password'])
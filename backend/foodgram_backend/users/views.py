@@ -1,5 +1,7 @@
+from django.db.models import Count, Exists, OuterRef, Prefetch, Value
 from django.shortcuts import get_object_or_404
 
+from recipes.models import Recipe
 from recipes.pagination import MyPagination
 from rest_framework import permissions, status, viewsets
 from rest_framework.decorators import action
@@ -15,12 +17,59 @@ from .serializers import (
 )
 
 
+def get_recipes_limit(request):
+    try:
+        recipes_limit = int(request.query_params.get('recipes_limit'))
+    except (TypeError, ValueError):
+        return None
+    return recipes_limit if recipes_limit >= 0 else None
+
+
+def with_is_subscribed(queryset, user):
+    """Annotate users with whether `user` follows them."""
+    if not user.is_authenticated:
+        return queryset.annotate(is_subscribed=Value(False))
+    return queryset.annotate(
+        is_subscribed=Exists(
+            UserSubscription.objects.filter(
+                from_user=user, to_user=OuterRef('pk')
+            )
+        )
+    )
+
+
+def with_subscription_data(queryset, recipes_limit=None):
+    """Annotate followed authors with recipes_count and newest recipes.
+
+    A sliced prefetch is executed by Django as a single query with a
+    ROW_NUMBER() window partitioned by author.
+    """
+    recipes = Recipe.objects.order_by('-created_at')
+    if recipes_limit is not None:
+        recipes = recipes[:recipes_limit]
+    return queryset.annotate(
+        recipes_count=Count('recipe'),
+        is_subscribed=Value(True)
+    ).prefetch_related(
+        Prefetch(
+            'recipe_set', queryset=recipes, to_attr='subscription_recipes'
+        )
+    )
+
+
 class MyUserViewSet(viewsets.ModelViewSet):
 
     permission_classes = [permissions.AllowAny]
     queryset = MyUser.objects.all()
     pagination_class = MyPagination
     serializer_class = MyUserCreateSerializer
+    query_budget = {
+        'list': 10,
+        'retrieve': 6,
+        'current_user': 4,
+        'subscriptions': 7,
+    }
+    read_replica = True
 
     def get_serializer_class(self):
         if self.action == 'create':
@@ -39,9 +88,13 @@ class MyUserViewSet(viewsets.ModelViewSet):
 
         if user_id:
             user = get_object_or_404(MyUser, pk=user_id)
-            return MyUser.objects.filter(pk=user.id)
+            return with_is_subscribed(
+                MyUser.objects.filter(pk=user.id), self.request.user
+            )
 
-        return MyUser.objects.all()
+        return with_is_subscribed(
+            MyUser.objects.order_by('pk'), self.request.user
+        )
 
     def list(self, request, *args, **kwargs):
         queryset = self.filter_queryset(self.get_queryset())
@@ -91,7 +144,12 @@ class MyUserViewSet(viewsets.ModelViewSet):
     @action(detail=False, methods=['get'])
     def subscriptions(self, request):
         user = self.request.user
-        subscriptions = user.subscriptions.all()
+        subscriptions = with_subscription_data(
+            MyUser.objects.filter(
+                subscriptions_to__from_user=user
+            ).order_by('-subscriptions_to__created_at'),
+            get_recipes_limit(request)
+        )
         page = self.paginate_queryset(subscriptions)
 
         if page is not None:
@@ -118,7 +176,7 @@ class MyUserViewSet(viewsets.ModelViewSet):
                 )
 
             user.set_password(new_password)
-            user.save()
+            user.save(update_fields=['password'])
 
             return Response(status=status.HTTP_204_NO_CONTENT)
         return Response(
@@ -130,6 +188,7 @@ class MyUserViewSet(viewsets.ModelViewSet):
 class SubscribeUserView(APIView):
 
     permission_classes = [permissions.IsAuthenticated]
+    query_budget = {'post': 10, 'delete': 8}
 
     def post(self, request, pk=None):
         target_user = get_object_or_404(MyUser, pk=pk)
@@ -145,6 +204,10 @@ class SubscribeUserView(APIView):
             from_user=current_user, to_user=target_user
         )
 
+        target_user = with_subscription_data(
+            MyUser.objects.filter(pk=target_user.pk),
+            get_recipes_limit(request)
+        ).get()
         serializer = MyUserSubscriptionSerializer(
             target_user, context={'request': request}
         )